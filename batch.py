@@ -0,0 +1,168 @@
+# standard library imports
+import argparse
+from concurrent.futures import ThreadPoolExecutor
+import itertools
+import os
+from pathlib import Path
+import subprocess
+import sys
+import time
+
+# third-party imports
+from loguru import logger
+import pandas as pd
+
+# local imports
+from settings import ACS_SPAN, ACS_YEAR, DATA_DIR, GEOID_LENGTHS, N_JOBS, SUMMARY_LEVEL
+
+
+def run_vintage(acs_year: int, acs_span: int, summary_level: str, n_threads: int, pipeline_args: list, log_dir: Path):
+    """Run pipeline.py for one vintage in a child process and return its wall time and peak resident memory.
+    The child reads its vintage from the environment, so its inputs, caches, and outputs land in that vintage's
+    directories; its BLAS and transform threads are capped at `n_threads` so concurrent vintages share the cores.
+    """
+    vintage = f"{acs_year}_{acs_span}y"
+    threads = str(n_threads)
+    env = dict(
+        os.environ,
+        GEOCLUSTERIZER_ACS_YEAR=str(acs_year),
+        GEOCLUSTERIZER_ACS_SPAN=str(acs_span),
+        GEOCLUSTERIZER_SUMMARY_LEVEL=summary_level,
+        GEOCLUSTERIZER_N_THREADS=threads,
+        OMP_NUM_THREADS=threads,
+        OPENBLAS_NUM_THREADS=threads,
+        MKL_NUM_THREADS=threads,
+    )
+    log_dst = log_dir / f"{vintage}__{summary_level}.log"
+    start = time.time()
+    with open(log_dst, "w") as f:
+        proc = subprocess.Popen(
+            [sys.executable, "pipeline.py", *pipeline_args], env=env, stdout=f, stderr=subprocess.STDOUT
+        )
+        _, status, usage = os.wait4(proc.pid, 0)
+    return {
+        "vintage": vintage,
+        "summary_level": summary_level,
+        "seconds": round(time.time() - start, 1),
+        "peak_rss_mb": round(usage.ru_maxrss / 1024, 1),  # linux reports kilobytes
+        "exit_code": os.WEXITSTATUS(status) if os.WIFEXITED(status) else -os.WTERMSIG(status),
+        "log": str(log_dst),
+    }
+
+
+if __name__ == "__main__":
+    """Segment several ACS vintages concurrently, each end to end in its own pipeline.py process"""
+    # @@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@
+    print("Configure and instantiate logger")
+    logger.add(
+        f"log_{__file__}.log".replace(".py", ""), backtrace=False, diagnose=False
+    )
+    logger.debug(f"Begin {__file__}")
+
+    # @@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@
+    print("Parse arguments")
+    try:
+        description = "Run the modeling pipeline for several ACS vintages at once"
+        parser = argparse.ArgumentParser(description=description)
+        parser.add_argument(
+            "-y",
+            "--years",
+            default=[ACS_YEAR],
+            help="ACS years to segment (e.g., 2016 2017 2018 2019 2020)",
+            nargs="*",
+            type=int,
+        )
+        parser.add_argument(
+            "-s",
+            "--spans",
+            default=[ACS_SPAN],
+            choices=[1, 5],
+            help="ACS spans to segment for every year",
+            nargs="*",
+            type=int,
+        )
+        parser.add_argument(
+            "-g",
+            "--summary_level",
+            default=SUMMARY_LEVEL,
+            choices=list(GEOID_LENGTHS),
+            help="Summary level to segment",
+        )
+        parser.add_argument(
+            "-j",
+            "--n_jobs",
+            default=None,
+            help="Vintages to run at once; defaults to one per vintage, up to the number of cores",
+            type=int,
+        )
+        parser.add_argument(
+            "-d",
+            "--download",
+            action="store_true",
+            help="Download each vintage's ACS files first, skipping those already on disk",
+        )
+        parser.add_argument(
+            "-k",
+            "--checkpoints",
+            default=[],
+            help="Intermediate outputs for each pipeline.py run to write (see pipeline.py -k)",
+            nargs="*",
+        )
+        parser.add_argument(
+            "-o",
+            "--output_dst",
+            default=DATA_DIR / "processed" / "batch.csv",
+            help="Path to save each vintage's wall time, peak memory, and exit code",
+            type=Path,
+        )
+        args = parser.parse_args()
+        vintages = list(itertools.product(args.years, args.spans))
+        n_jobs = args.n_jobs or min(len(vintages), N_JOBS)
+        n_threads = max(1, N_JOBS // n_jobs)
+        pipeline_args = (["-d"] if args.download else []) + (["-k", *args.checkpoints] if args.checkpoints else [])
+        log_dir = args.output_dst.parent / "batch_logs"
+        log_dir.mkdir(parents=True, exist_ok=True)
+        logger.debug("Finish parsing arguments")
+    except Exception:
+        logger.error("Failed to parse arguments", exc_info=True)
+        raise
+
+    # @@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@
+    print(f"Run {len(vintages)} vintage(s), {n_jobs} at a time with {n_threads} thread(s) each")
+    try:
+        start = time.time()
+        with ThreadPoolExecutor(max_workers=n_jobs) as executor:
+            futures = [
+                executor.submit(
+                    run_vintage, year, span, args.summary_level, n_threads, pipeline_args, log_dir
+                )
+                for year, span in vintages
+            ]
+            results = []
+            for future in futures:
+                result = future.result()
+                results.append(result)
+                logger.debug(
+                    f"{result['vintage']}: {result['seconds']}s, {result['peak_rss_mb']} MB peak RSS, "
+                    f"exit code {result['exit_code']} (log: {result['log']})"
+                )
+        seconds = time.time() - start
+        serial_seconds = sum(x["seconds"] for x in results)
+        logger.debug(
+            f"Ran {len(results)} vintage(s) in {seconds:.1f}s, {serial_seconds:.1f}s of vintage time "
+            f"({serial_seconds / max(seconds, 1e-9):.1f}x a serial run)"
+        )
+    except Exception:
+        logger.error("Failed to run vintages", exc_info=True)
+        raise
+
+    # @@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@
+    print("Save results")
+    try:
+        df = pd.DataFrame(results)
+        df.to_csv(args.output_dst, index=False)
+        print(df.to_string(index=False))
+        logger.debug(f"Saved batch results to {args.output_dst}")
+    except Exception:
+        logger.error("Failed to save results", exc_info=True)
+        raise
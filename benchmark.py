@@ -0,0 +1,104 @@
+# standard library imports
+import argparse
+import os
+from pathlib import Path
+import subprocess
+import sys
+import time
+
+# third-party imports
+from loguru import logger
+import pandas as pd
+
+# local imports
+from settings import DATA_DIR, GEOID_LENGTHS
+
+STAGES = ["parse_acs.py", "scale_impute.py", "select_n_components.py", "cluster.py"]
+
+
+def run_stage(script: str, summary_level: str) -> dict:
+    """Run one pipeline stage in a child process and return its wall time and peak resident memory"""
+    env = dict(os.environ, GEOCLUSTERIZER_SUMMARY_LEVEL=summary_level)
+    start = time.time()
+    proc = subprocess.Popen([sys.executable, script], env=env)
+    _, status, usage = os.wait4(proc.pid, 0)
+    return {
+        "summary_level": summary_level,
+        "stage": Path(script).stem,
+        "seconds": round(time.time() - start, 1),
+        "peak_rss_mb": round(usage.ru_maxrss / 1024, 1),  # linux reports kilobytes
+        "exit_code": os.WEXITSTATUS(status) if os.WIFEXITED(status) else -os.WTERMSIG(status),
+    }
+
+
+if __name__ == "__main__":
+    """Time each pipeline stage and record its peak memory, per summary level"""
+    # @@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@
+    print("Configure and instantiate logger")
+    logger.add(
+        f"log_{__file__}.log".replace(".py", ""), backtrace=False, diagnose=False
+    )
+    logger.debug(f"Begin {__file__}")
+
+    # @@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@
+    print("Parse arguments")
+    try:
+        description = "Benchmark wall time and peak memory of each pipeline stage"
+        parser = argparse.ArgumentParser(description=description)
+        parser.add_argument(
+            "-g",
+            "--summary_levels",
+            default=list(GEOID_LENGTHS),
+            choices=list(GEOID_LENGTHS),
+            help="Summary levels to benchmark",
+            nargs="*",
+        )
+        parser.add_argument(
+            "-o",
+            "--output_dst",
+            default=DATA_DIR / "processed" / "benchmark.csv",
+            help="Path to save the benchmark results",
+            type=Path,
+        )
+        parser.add_argument(
+            "-s",
+            "--stages",
+            default=STAGES,
+            help="Stage scripts to run, in order",
+            nargs="*",
+        )
+        args = parser.parse_args()
+        logger.debug("Finish parsing arguments")
+    except Exception:
+        logger.error("Failed to parse arguments", exc_info=True)
+        raise
+
+    # @@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@
+    print("Run stages")
+    try:
+        results = []
+        for summary_level in args.summary_levels:
+            for script in args.stages:
+                result = run_stage(script, summary_level)
+                results.append(result)
+                logger.debug(
+                    f"{summary_level} {result['stage']}: {result['seconds']}s, "
+                    f"{result['peak_rss_mb']} MB peak RSS, exit code {result['exit_code']}"
+                )
+                if result["exit_code"] != 0:
+                    logger.warning(f"{script} failed for {summary_level}; skipping later stages")
+                    break
+    except Exception:
+        logger.error("Failed to run stages", exc_info=True)
+        raise
+
+    # @@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@
+    print("Save results")
+    try:
+        df = pd.DataFrame(results)
+        df.to_csv(args.output_dst, index=False)
+        print(df.to_string(index=False))
+        logger.debug(f"Saved benchmark results to {args.output_dst}")
+    except Exception:
+        logger.error("Failed to save results", exc_info=True)
+        raise
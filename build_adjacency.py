@@ -0,0 +1,73 @@
+# standard library imports
+import argparse
+from pathlib import Path
+import pickle
+import time
+
+# third-party imports
+from loguru import logger
+
+# local imports
+from settings import CONTIGUITY, TRACT_STORE_DIR
+from src.geo import TractStore, build_adjacency
+
+
+if __name__ == "__main__":
+    """Build and cache a sparse tract contiguity matrix from the tract geometry store"""
+    # @@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@
+    print("Configure and instantiate logger")
+    logger.add(
+        f"log_{__file__}.log".replace(".py", ""), backtrace=False, diagnose=False
+    )
+    logger.debug(f"Begin {__file__}")
+
+    # @@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@
+    print("Parse arguments")
+    try:
+        description = "Build sparse tract contiguity matrix"
+        parser = argparse.ArgumentParser(description=description)
+        parser.add_argument(
+            "-c",
+            "--contiguity",
+            default=CONTIGUITY,
+            choices=["queen", "rook"],
+            help="Queen (shared vertex) or rook (shared edge) contiguity",
+        )
+        parser.add_argument(
+            "-s",
+            "--store_dir",
+            default=TRACT_STORE_DIR,
+            help="Path to tract geometry store",
+            type=Path,
+        )
+        args = parser.parse_args()
+        dst = args.store_dir / f"adjacency__{args.contiguity}.pkl"
+        logger.debug("Finish parsing arguments")
+    except Exception:
+        logger.error("Failed to parse arguments", exc_info=True)
+        raise
+
+    # @@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@
+    print("Build contiguity matrix")
+    try:
+        start = time.time()
+        store = TractStore(args.store_dir)
+        adjacency = build_adjacency(store.tracts, contiguity=args.contiguity)
+        n_links = int(adjacency.nnz / 2)
+        logger.debug(
+            f"Built {args.contiguity} contiguity for {adjacency.shape[0]} tracts "
+            f"({n_links} links) in {time.time() - start:.1f}s"
+        )
+    except Exception:
+        logger.error("Failed to build contiguity matrix", exc_info=True)
+        raise
+
+    # @@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@
+    print(f"Save outputs to {dst}")
+    try:
+        with open(str(dst), "wb") as f:
+            pickle.dump({"geoids": list(store.tracts.index), "adjacency": adjacency}, f)
+        logger.debug(f"Finished saving outputs to {dst}")
+    except Exception:
+        logger.error("Failed to save outputs", exc_info=True)
+        raise
@@ -0,0 +1,94 @@
+# standard library imports
+import argparse
+from pathlib import Path
+import time
+
+# third-party imports
+from loguru import logger
+import pandas as pd
+
+# local imports
+from settings import PROCESSED_DIR, SIMPLIFY_TOLERANCES, TILE_ZOOMS, TILES_DIR, TRACT_STORE_DIR
+from src.geo import TractStore
+from src.tiles import TilePyramid
+
+
+if __name__ == "__main__":
+    """Render labeled tracts into a static pyramid of simplified GeoJSON tiles plus a Leaflet viewer"""
+    # @@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@
+    print("Configure and instantiate logger")
+    logger.add(
+        f"log_{__file__}.log".replace(".py", ""), backtrace=False, diagnose=False
+    )
+    logger.debug(f"Begin {__file__}")
+
+    # @@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@
+    print("Parse arguments")
+    try:
+        description = "Build cluster map tile pyramid"
+        parser = argparse.ArgumentParser(description=description)
+        parser.add_argument(
+            "-i",
+            "--labeled_src",
+            default=PROCESSED_DIR / "labeled.pkl",
+            help="Path to labeled tracts",
+            type=Path,
+        )
+        parser.add_argument(
+            "-s",
+            "--store_dir",
+            default=TRACT_STORE_DIR,
+            help="Path to tract geometry store",
+            type=Path,
+        )
+        parser.add_argument(
+            "-o",
+            "--output_dir",
+            default=TILES_DIR,
+            help="Directory to save the tiles and map page",
+            type=Path,
+        )
+        parser.add_argument(
+            "-z",
+            "--zooms",
+            default=TILE_ZOOMS,
+            help="Zoom levels to render",
+            nargs="*",
+            type=int,
+        )
+        args = parser.parse_args()
+        logger.debug("Finish parsing arguments")
+    except Exception:
+        logger.error("Failed to parse arguments", exc_info=True)
+        raise
+
+    # @@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@
+    print("Load labels and geometries")
+    try:
+        labeled = pd.read_pickle(args.labeled_src)
+        labels = pd.Series(
+            labeled.index.get_level_values("cluster"),
+            index=labeled.index.get_level_values("geoid"),
+        )
+        levels = ["full"] + SIMPLIFY_TOLERANCES
+        tracts_by_level = {x: TractStore(args.store_dir, level=x).tracts for x in levels}
+        # the store is rebuilt, not edited, so its file stamps identify the geometries
+        geometry_fingerprint = [
+            TractStore.get_level_path(args.store_dir, x).stat().st_mtime_ns for x in levels
+        ]
+        logger.debug(f"Loaded {len(labels)} labels and {len(levels)} geometry levels")
+    except Exception:
+        logger.error("Failed to load labels / geometries", exc_info=True)
+        raise
+
+    # @@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@
+    print("Render tiles")
+    try:
+        start = time.time()
+        pyramid = TilePyramid(args.output_dir, args.zooms)
+        pyramid.build(tracts_by_level, labels, geometry_fingerprint)
+        pyramid.write_index(n_clusters=int(labels.max()) + 1)
+        logger.debug(f"Rendered tiles in {time.time() - start:.1f}s")
+    except Exception:
+        logger.error("Failed to render tiles", exc_info=True)
+        raise
@@ -0,0 +1,81 @@
+# standard library imports
+import argparse
+from pathlib import Path
+import time
+
+# third-party imports
+from loguru import logger
+
+# local imports
+from settings import CRS, RAW_SHAPEFILES_DIR, SIMPLIFY_TOLERANCES, TIGER_LAYER, TRACT_STORE_DIR
+from src.geo import TractStore
+
+
+if __name__ == "__main__":
+    """Convert TIGER tract shapefiles into a compact, geoid-indexed geometry store with a persisted R-tree"""
+    # @@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@
+    print("Configure and instantiate logger")
+    logger.add(
+        f"log_{__file__}.log".replace(".py", ""), backtrace=False, diagnose=False
+    )
+    logger.debug(f"Begin {__file__}")
+
+    # @@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@
+    print("Parse arguments")
+    try:
+        description = "Build tract geometry store from TIGER shapefiles"
+        parser = argparse.ArgumentParser(description=description)
+        parser.add_argument(
+            "-i",
+            "--shapefiles_dir",
+            default=RAW_SHAPEFILES_DIR,
+            help="Directory of downloaded TIGER tract shapefile zips",
+            type=Path,
+        )
+        parser.add_argument(
+            "-l",
+            "--layer",
+            default=TIGER_LAYER,
+            help="TIGER layer suffix of the shapefile zips (tract or bg)",
+        )
+        parser.add_argument(
+            "-o",
+            "--output_dir",
+            default=TRACT_STORE_DIR,
+            help="Directory to save the geometry store and spatial index",
+            type=Path,
+        )
+        parser.add_argument(
+            "-t",
+            "--tolerances",
+            default=SIMPLIFY_TOLERANCES,
+            help="Simplification tolerances, in degrees, for the lighter map layers",
+            nargs="*",
+            type=float,
+        )
+        args = parser.parse_args()
+        logger.debug("Finish parsing arguments")
+    except Exception:
+        logger.error("Failed to parse arguments", exc_info=True)
+        raise
+
+    # @@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@
+    print("Build tract geometry store")
+    try:
+        start = time.time()
+        srcs = sorted(args.shapefiles_dir.glob(f"*_{args.layer}.zip"))
+        TractStore.build(srcs, args.output_dir, CRS, tolerances=args.tolerances, verbose=True)
+        logger.debug(f"Built tract geometry store from {len(srcs)} shapefiles in {time.time() - start:.1f}s")
+    except Exception:
+        logger.error("Failed to build tract geometry store", exc_info=True)
+        raise
+
+    # @@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@
+    print("Check load time")
+    try:
+        start = time.time()
+        store = TractStore(args.output_dir)
+        logger.debug(f"Loaded {len(store.tracts)} tracts in {time.time() - start:.1f}s")
+    except Exception:
+        logger.error("Failed to load tract geometry store", exc_info=True)
+        raise
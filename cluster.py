@@ -3,7 +3,9 @@
 
 # standard library imports
 import argparse
+import json
 from pathlib import Path
+import time
 
 # third party imports
 from loguru import logger
@@ -11,18 +13,40 @@ import pickle
 import numpy as np
 import pandas as pd
 import linearcorex as lc
+from scipy.optimize import linear_sum_assignment
 from sklearn.mixture import GaussianMixture
 from sklearn.model_selection import train_test_split
 
 # local imports
 from settings import (
+    CONTIGUITY,
+    COVARIANCE_TYPES,
+    FIT_CACHE_DIR,
+    FIT_CACHE_MAX_BYTES,
+    GM_N_SAMPLES,
+    GM_TIME_BUDGET,
     INTERIM_DIR,
     PROCESSED_DIR,
     MAX_COMPONENTS,
+    MODEL_DATA_NAME,
     MODELS_DIR,
+    MOE_WEIGHTED,
     N_SAMPLES,
+    N_THREADS,
+    PRUNE_CORR,
     RANDOM_STATE,
+    SMOOTH_ALPHA,
+    SMOOTH_N_ITER,
+    TRACT_STORE_DIR,
+    TRANSFORM_BLOCK_SIZE,
 )
+from src.acs import ACS
+from src.blocks import map_blocks
+from src.cache import FitCache
+from src.geo import align_adjacency, smooth_posteriors
+from src.matching import match_labels
+from src.models import fit_corex_model
+from src.neighbors import SimilarTracts
 
 
 def find_elbow(s: pd.Series, keep="last") -> dict:
@@ -44,36 +68,416 @@ def find_elbow(s: pd.Series, keep="last") -> dict:
     }
 
 
-def label_data(frame, model):
-    """Predict cluster label for each tract"""
-    frame["cluster"] = model.predict(X)
+def get_reliability_weights(frame, moes) -> pd.Series:
+    """Weight each tract by 1 / (1 + median coefficient of variation of its estimates)"""
+    cv = ACS.coefficient_of_variation(frame, moes.reindex(index=frame.index, columns=frame.columns))
+    return 1 / (1 + cv.median(axis=1).fillna(cv.median(axis=1).median()))
+
+
+def label_data(frame, labels):
+    """Attach cluster label to each tract"""
+    frame = frame.assign(cluster=labels)
     ix = ["geoid", "state_abbr", "logrecno", "geo_label", "cluster"]
     return frame.reset_index().set_index(ix)
 
 
+def warm_start_corex_model(params: dict, X: np.array, columns, prev_model):
+    """Fit Corex starting from a previous model's weights instead of a random, annealed initialization.
+    Weights are aligned on feature names; features the previous model did not see start at zero.
+    Returns (model, order), where order[j] is the previous model's factor that the new factor j was started from.
+    """
+    ce_model = lc.Corex(verbose=True, **params)
+    prev_columns = getattr(prev_model, "feature_columns_", columns)
+    ws = pd.DataFrame(prev_model.ws, columns=prev_columns).reindex(columns=columns).fillna(0)
+    ce_model.ws = ws.values.astype(np.float32)
+    ce_model.fit(X)
+    # fit sorts factors by total correlation, so recover which starting factor each new factor came from
+    similarity = np.corrcoef(ce_model.ws, ws.values)[: len(ws), len(ws) :]
+    _, order = linear_sum_assignment(-similarity)
+    return ce_model, order
+
+
+def fit_gaussian_mixture_model(gm: GaussianMixture, X: np.array) -> dict:
+    start = time.time()
+    gm.fit(X)
+    return {"model": gm, "aic": gm.aic(X), "bic": gm.bic(X), "seconds": round(time.time() - start, 2)}
+
+
+def warm_start_gaussian_mixture_model(prev_gm: GaussianMixture, X: np.array, order, random_state) -> dict:
+    """Fit a Gaussian Mixture from a previous model's weights, means, and precisions.
+    `order` maps the new latent factors to the previous model's (see warm_start_corex_model).
+    """
+    precisions = prev_gm.precisions_
+    if prev_gm.covariance_type == "full":
+        precisions = precisions[:, order][:, :, order]
+    elif prev_gm.covariance_type == "tied":
+        precisions = precisions[order][:, order]
+    elif prev_gm.covariance_type == "diag":
+        precisions = precisions[:, order]
+    gm = GaussianMixture(
+        n_components=prev_gm.n_components,
+        covariance_type=prev_gm.covariance_type,
+        weights_init=prev_gm.weights_,
+        means_init=prev_gm.means_[:, order],
+        precisions_init=precisions,
+        random_state=random_state,
+    )
+    return fit_gaussian_mixture_model(gm, X)
+
+
+def reorder_gaussian_mixture_model(gm: GaussianMixture, order) -> GaussianMixture:
+    """Renumber components in place so that new component k is old component order[k]"""
+    gm.weights_ = gm.weights_[order]
+    gm.means_ = gm.means_[order]
+    if gm.covariance_type != "tied":
+        gm.covariances_ = gm.covariances_[order]
+        gm.precisions_ = gm.precisions_[order]
+        gm.precisions_cholesky_ = gm.precisions_cholesky_[order]
+    return gm
+
+
 def train_gaussian_mixture_models(
-    X: np.array, n_components_li, random_state, verbose=False
+    X: np.array,
+    n_components_li,
+    random_state,
+    verbose=False,
+    cache=None,
+    covariance_types=("full",),
+    time_budget=None,
 ):
-    """Train a set of Gaussian Mixture models and summary statistics for each model"""
+    """Train a set of Gaussian Mixture models and summary statistics for each model, keyed by
+    (covariance type, number of components).
+    Every covariance type is fit for one number of components before moving on to the next. With a `time_budget`
+    (seconds), a covariance type's sweep stops when its last fit, scaled up to the next number of components, would
+    overrun what is left of the budget, so only models fitted within the budget are returned.
+    With a FitCache, models already fitted on the same data with the same parameters are loaded instead.
+    """
     gm_outputs = {}
+    data_fingerprint = None if cache is None else cache.fingerprint(X)
+    start = time.time()
+    active_types = list(covariance_types)  # a covariance type that no longer fits in the budget is dropped for good
+    last_fits = {}  # covariance type -> (n_components, wall seconds) of its latest fit
     for n_components in n_components_li:
-        gm = GaussianMixture(
-            n_components=n_components,
-            n_init=1,
-            covariance_type="full",
-            warm_start=True,
-            verbose=verbose,
-            random_state=random_state,
-        )
-        gm.fit(X)
-        aic = gm.aic(X)
-        bic = gm.bic(X)
-        if verbose:
-            print(f"n_components={n_components}, AIC={round(aic)}, BIC={round(bic)})")
-        gm_outputs[n_components] = {"model": gm, "aic": aic, "bic": bic}
+        for covariance_type in list(active_types):
+            if (time_budget is not None) and gm_outputs:
+                remaining = time_budget - (time.time() - start)
+                last_n_components, last_seconds = last_fits.get(covariance_type, (n_components, 0))
+                if (remaining <= 0) or (last_seconds * n_components / last_n_components > remaining):
+                    logger.debug(
+                        f"Stopped the {covariance_type} covariance sweep at {n_components} components: "
+                        f"{max(remaining, 0):.1f}s of the {time_budget}s budget left"
+                    )
+                    active_types.remove(covariance_type)
+                    continue
+            gm = GaussianMixture(
+                n_components=n_components,
+                n_init=1,
+                covariance_type=covariance_type,
+                warm_start=True,
+                verbose=verbose,
+                random_state=random_state,
+            )
+            fit_start = time.time()
+            if cache is None:
+                output = fit_gaussian_mixture_model(gm, X)
+            else:
+                output = cache.get_or_fit(
+                    "gaussian_mixture",
+                    data_fingerprint,
+                    gm.get_params(),
+                    lambda: fit_gaussian_mixture_model(gm, X),
+                )
+            last_fits[covariance_type] = (n_components, time.time() - fit_start)
+            aic, bic = output["aic"], output["bic"]
+            if verbose:
+                print(
+                    f"covariance_type={covariance_type}, n_components={n_components}, "
+                    f"AIC={round(aic)}, BIC={round(bic)})"
+                )
+            gm_outputs[(covariance_type, n_components)] = output
     return gm_outputs
 
 
+def summarize_gaussian_mixture_models(gm_outputs: dict) -> pd.DataFrame:
+    """One row per fitted model with its BIC, AIC, fit seconds, and iterations"""
+    return pd.DataFrame(
+        [
+            {
+                "covariance_type": covariance_type,
+                "n_components": n_components,
+                "bic": x["bic"],
+                "aic": x["aic"],
+                "seconds": x.get("seconds"),  # fits cached before fit times were recorded have none
+                "n_iter": int(x["model"].n_iter_),
+                "converged": bool(x["model"].converged_),
+            }
+            for (covariance_type, n_components), x in gm_outputs.items()
+        ]
+    )
+
+
+def select_gaussian_mixture_model(summary: pd.DataFrame) -> tuple:
+    """Find the elbow of each covariance type's BIC curve, then pick the covariance type with the lowest BIC there.
+    Returns (covariance type, number of components).
+    """
+    elbows = {}
+    for covariance_type, frame in summary.groupby("covariance_type", sort=False):
+        bic = frame.set_index("n_components")["bic"].sort_index()
+        n_components = find_elbow(bic)["elbow"]
+        elbows[(covariance_type, n_components)] = bic[n_components]
+    return min(elbows, key=elbows.get)
+
+
+def cluster_tracts(
+    df: pd.DataFrame,
+    selected_n_components: int,
+    max_components: int,
+    random_state: int,
+    weights=None,
+    cache=None,
+    smooth_alpha=0.0,
+    adjacency_src=None,
+    warm_start=None,
+    redundant=None,
+    block_size=TRANSFORM_BLOCK_SIZE,
+    covariance_types=COVARIANCE_TYPES,
+    time_budget=GM_TIME_BUDGET,
+) -> dict:
+    """Fit Corex and the Gaussian Mixture sweep on scaled, imputed data and label each tract.
+    `warm_start` is the output of load_warm_start; `redundant` is prune_features.py's map of dropped columns.
+    The sweep covers `covariance_types` x 2..max_components, within `time_budget` seconds if one is given.
+    Every tract is transformed and labeled `block_size` rows at a time across N_THREADS threads.
+    Returns the fitted models, the Corex map, the latent matrix, the labels, and fit statistics.
+    """
+    fit_stats = {}
+    prev_ce_model, prev_gm_model, prev_fit_stats = None, None, {}
+    if warm_start is not None:
+        prev_ce_model, prev_gm_model = warm_start["corex"], warm_start["gaussian_mixture"]
+        prev_fit_stats = warm_start["fit_stats"]
+
+    # @@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@
+    print("Train Corex model using selected number of components")
+    try:
+        ce_params = dict(
+            n_hidden=selected_n_components, gaussianize="outliers", seed=RANDOM_STATE
+        )
+        ce_train = df.sample(
+            N_SAMPLES, random_state=RANDOM_STATE, replace=True, weights=weights
+        ).values
+        start = time.time()
+        factor_order = None
+        if prev_ce_model is not None:
+            ce_model, factor_order = warm_start_corex_model(ce_params, ce_train, df.columns, prev_ce_model)
+        else:
+            ce_model = fit_corex_model(ce_params, ce_train, cache=cache)
+        ce_model.feature_columns_ = list(df.columns)  # lets the next vintage align its warm start on feature names
+        fit_stats["corex"] = {
+            "warm_start": prev_ce_model is not None,
+            "n_iter": len(ce_model.history.get("TC", [])),
+            "seconds": round(time.time() - start, 1),
+        }
+    except Exception:
+        logger.error("Failed to train Corex model", exc_info=True)
+        raise
+
+    # @@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@
+    print("Map hidden layers to original features")
+    try:
+        index = [x + 1 for x in range(selected_n_components)]
+        ce_map = (
+            pd.Series(ce_model.clusters(), index=df.columns, name="component")
+            .to_frame()
+            .sort_index()
+            .sort_values(by="component")
+        )
+        if redundant is not None:
+            # columns pruned as duplicates belong to the component of the column they duplicate
+            redundant = redundant[redundant["representative"].isin(ce_map.index)]
+            ce_map_redundant = pd.DataFrame(
+                {
+                    "component": ce_map["component"].reindex(redundant["representative"]).values,
+                    "represented_by": redundant["representative"].values,
+                },
+                index=redundant.index,
+            )
+            ce_map = pd.concat([ce_map, ce_map_redundant]).sort_index().sort_values(by="component", kind="stable")
+    except Exception:
+        logger.error("Failed to map hidden layers to original features", exc_info=True)
+        raise
+
+    # @@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@
+    print("Select optimal number of clusters and train best model")
+    try:
+        X = pd.DataFrame(map_blocks(ce_model.transform, df.values, block_size, N_THREADS), index=df.index)
+        # large geographies fit each mixture on a subsample; every row is still labeled below
+        X_train = X
+        if (GM_N_SAMPLES is not None) and (GM_N_SAMPLES < len(X)):
+            X_train = X.sample(GM_N_SAMPLES, random_state=random_state)
+        start = time.time()
+        if prev_gm_model is not None:
+            # keep the previous vintage's number of clusters instead of re-running the sweep
+            selected = (prev_gm_model.covariance_type, prev_gm_model.n_components)
+            outputs = {
+                selected: warm_start_gaussian_mixture_model(
+                    prev_gm_model, X_train.values, factor_order, random_state
+                )
+            }
+        else:
+            outputs = train_gaussian_mixture_models(
+                X_train.values,
+                list(range(2, max_components)),
+                random_state,
+                cache=cache,
+                covariance_types=covariance_types,
+                time_budget=time_budget,
+            )
+            if cache is not None:
+                cache.log_stats()
+        gm_summary = summarize_gaussian_mixture_models(outputs)
+        selected = select_gaussian_mixture_model(gm_summary)
+        selected_gm_model = outputs[selected]["model"]
+        for covariance_type, frame in gm_summary.groupby("covariance_type", sort=False):
+            logger.debug(
+                f"{covariance_type} covariance: {len(frame)} fit(s), {frame['seconds'].sum():.1f}s, "
+                f"lowest BIC {frame['bic'].min():.0f} at {frame.loc[frame['bic'].idxmin(), 'n_components']} components"
+            )
+        logger.debug(f"Selected {selected[0]} covariance with {selected[1]} components")
+        fit_stats["gaussian_mixture"] = {
+            "warm_start": prev_gm_model is not None,
+            "n_iter": int(sum(x["model"].n_iter_ for x in outputs.values())),
+            "seconds": round(time.time() - start, 1),
+            "covariance_type": selected[0],
+            "n_components": int(selected[1]),
+            "time_budget": time_budget,
+            "sweep": json.loads(gm_summary.round({"bic": 1, "aic": 1}).to_json(orient="records")),
+        }
+        logger.debug("Selected optimal number of clusters and trained best model")
+    except Exception:
+        logger.error(
+            "Failed to select optimal number of clusters / train best model",
+            exc_info=True,
+        )
+        raise
+
+    # @@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@
+    print("Compare fit cost with a cold start")
+    try:
+        if prev_gm_model is None:
+            # a cold start is the reference that later warm starts are measured against
+            fit_stats["cold_start"] = {k: fit_stats[k] for k in ["corex", "gaussian_mixture"]}
+        else:
+            fit_stats["cold_start"] = prev_fit_stats.get("cold_start")
+        if (prev_gm_model is not None) and (fit_stats["cold_start"] is not None):
+            for k in ["corex", "gaussian_mixture"]:
+                cold, warm = fit_stats["cold_start"][k], fit_stats[k]
+                logger.debug(
+                    f"{k}: warm start took {warm['n_iter']} iterations / {warm['seconds']}s vs. "
+                    f"{cold['n_iter']} / {cold['seconds']}s cold, saving {cold['seconds'] - warm['seconds']:.1f}s"
+                )
+    except Exception:
+        logger.error("Failed to compare fit cost with a cold start", exc_info=True)
+        raise
+
+    # @@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@
+    print("Label tracts")
+    try:
+        if prev_gm_model is not None:
+            prev_neighbors = warm_start["neighbors"]
+            # renumber components so that tracts keep the cluster ids they had in the previous vintage
+            labels = map_blocks(selected_gm_model.predict, X.values, block_size, N_THREADS)
+            prev_labels = pd.Series(prev_neighbors.clusters, index=prev_neighbors.geoids)
+            geoids = df.index.get_level_values("geoid")
+            m = geoids.isin(prev_labels.index)
+            mapping = match_labels(
+                prev_labels.reindex(geoids[m]).values, labels[m], prev_gm_model.n_components
+            )
+            reorder_gaussian_mixture_model(selected_gm_model, np.argsort(mapping))
+            logger.debug(f"Aligned cluster ids with the previous vintage on {m.sum()} shared tracts")
+        labels = map_blocks(selected_gm_model.predict, X.values, block_size, N_THREADS)
+        if smooth_alpha > 0:
+            with open(str(adjacency_src), "rb") as f:
+                adjacency_obj = pickle.load(f)
+            adjacency = align_adjacency(
+                adjacency_obj["adjacency"],
+                adjacency_obj["geoids"],
+                df.index.get_level_values("geoid"),
+            )
+            proba = smooth_posteriors(
+                map_blocks(selected_gm_model.predict_proba, X.values, block_size, N_THREADS),
+                adjacency,
+                alpha=smooth_alpha,
+                n_iter=SMOOTH_N_ITER,
+            )
+            smoothed_labels = proba.argmax(axis=1)
+            logger.debug(
+                f"Spatial smoothing changed {(smoothed_labels != labels).sum()} of {len(labels)} labels"
+            )
+            labels = smoothed_labels
+        logger.debug("Labeled tracts")
+    except Exception:
+        logger.error("Failed to label tracts", exc_info=True)
+        raise
+
+    return {
+        "ce_model": ce_model,
+        "ce_map": ce_map,
+        "gm_model": selected_gm_model,
+        "X": X,
+        "labels": labels,
+        "fit_stats": fit_stats,
+    }
+
+
+def load_warm_start(warm_start_dir: Path, selected_n_components: int):
+    """Load a previous vintage's models for cluster_tracts, or None if its Corex has a different number of factors"""
+    with open(str(warm_start_dir / "corex.pkl"), "rb") as f:
+        prev_ce_model = pickle.load(f)
+    if prev_ce_model.m != selected_n_components:
+        logger.warning(
+            f"Previous Corex has {prev_ce_model.m} factors, not {selected_n_components}; fitting from scratch"
+        )
+        return None
+    with open(str(warm_start_dir / "gaussian_mixture.pkl"), "rb") as f:
+        prev_gm_model = pickle.load(f)
+    prev_fit_stats = {}
+    if (warm_start_dir / "fit_stats.json").exists():
+        with open(warm_start_dir / "fit_stats.json") as f:
+            prev_fit_stats = json.load(f)
+    return {
+        "corex": prev_ce_model,
+        "gaussian_mixture": prev_gm_model,
+        "neighbors": SimilarTracts.load(warm_start_dir / "similar_tracts.pkl"),
+        "fit_stats": prev_fit_stats,
+    }
+
+
+def save_outputs(outputs: dict, df: pd.DataFrame, df_orig: pd.DataFrame, models_dir: Path, processed_dir: Path):
+    """Save cluster_tracts' models, labeled data, Corex map, fit statistics, and nearest-neighbour index"""
+    labels = outputs["labels"]
+    # corex and gaussian mixture models
+    with open(str(models_dir / "corex.pkl"), "wb") as f:
+        pickle.dump(outputs["ce_model"], f)
+    with open(str(models_dir / "gaussian_mixture.pkl"), "wb") as f:
+        pickle.dump(outputs["gm_model"], f)
+    with open(models_dir / "fit_stats.json", "w") as f:
+        json.dump(outputs["fit_stats"], f, indent=2)
+    # labeled, scaled and unscaled data
+    for frame, name in [(df, "labeled"), (df_orig, "labeled_orig")]:
+        labeled_data = label_data(frame, labels)
+        labeled_data.to_pickle(processed_dir / f"{name}.pkl")
+        labeled_data.to_csv(processed_dir / f"{name}.csv")
+    # corex map of features to hidden layers
+    outputs["ce_map"].to_csv(models_dir / "ce_map.pkl")
+    # nearest-neighbour index over the corex latent space
+    SimilarTracts(
+        outputs["X"].values,
+        df.index.get_level_values("geoid"),
+        df.index.get_level_values("state_abbr"),
+        labels,
+    ).save(models_dir / "similar_tracts.pkl")
+    return True
+
+
 if __name__ == "__main__":
     # @@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@
     print("Configure and instantiate logger")
@@ -129,17 +533,78 @@ if __name__ == "__main__":
             help="Path to processed data directory",
             type=Path,
         )
+        parser.add_argument(
+            "-f",
+            "--no_fit_cache",
+            action="store_true",
+            help="Refit every model instead of loading identical fits from the fit cache",
+        )
+        parser.add_argument(
+            "-w",
+            "--moe_weighted",
+            action="store_true",
+            default=MOE_WEIGHTED,
+            help="Sample the Corex training set in proportion to tract reliability; requires parsed margins of error",
+        )
+        parser.add_argument(
+            "-s",
+            "--smooth_alpha",
+            default=SMOOTH_ALPHA,
+            help="Weight of neighboring tracts' posteriors when smoothing labels; 0 turns smoothing off",
+            type=float,
+        )
+        parser.add_argument(
+            "-a",
+            "--adjacency_src",
+            default=TRACT_STORE_DIR / f"adjacency__{CONTIGUITY}.pkl",
+            help="Path to cached tract contiguity matrix, used when smoothing labels",
+            type=Path,
+        )
+        parser.add_argument(
+            "-v",
+            "--covariance_types",
+            default=COVARIANCE_TYPES,
+            choices=["full", "tied", "diag", "spherical"],
+            help="Gaussian Mixture covariance structures to search alongside the number of components",
+            nargs="*",
+        )
+        parser.add_argument(
+            "-T",
+            "--time_budget",
+            default=GM_TIME_BUDGET,
+            help="Seconds for the Gaussian Mixture sweep; the best model fitted within it is kept",
+            type=float,
+        )
+        parser.add_argument(
+            "-B",
+            "--block_size",
+            default=TRANSFORM_BLOCK_SIZE,
+            help="Rows transformed by Corex and labeled by the Gaussian Mixture per thread at a time",
+            type=int,
+        )
+        parser.add_argument(
+            "-W",
+            "--warm_start_dir",
+            default=None,
+            help="Models directory of a previous vintage; refit its Corex and selected Gaussian Mixture from their "
+            "parameters instead of from scratch, and keep its cluster ids",
+            type=Path,
+        )
         args = parser.parse_args()
         max_components = args.max_components
         ce_src = args.processed_dir / "selected_n_components.pkl"
-        src = args.processed_dir / "scaled_imputed_data.pkl"
+        src = args.processed_dir / MODEL_DATA_NAME
         orig_src = args.interim_dir / "acs__preprocessed_tables.pkl"
-        gm_dst = args.models_dir / "gaussian_mixture.pkl"
-        ce_dst = args.models_dir / "corex.pkl"
-        ce_map_dst = args.models_dir / "ce_map.pkl"
-        labeled_dst = args.processed_dir / "labeled.pkl"
-        labeled_orig_dst = args.processed_dir / "labeled_orig.pkl"
+        moe_src = args.interim_dir / "acs__preprocessed_moes.pkl"
+        models_dir = args.models_dir
+        processed_dir = args.processed_dir
+        redundant_src = args.models_dir / "redundant_features.csv"
+        warm_start_dir = args.warm_start_dir
         random_state = args.random_state
+        smooth_alpha = args.smooth_alpha
+        moe_weighted = args.moe_weighted
+        cache = None if args.no_fit_cache else FitCache(FIT_CACHE_DIR, FIT_CACHE_MAX_BYTES)
+        adjacency_src = args.adjacency_src
         logger.debug("Finish parsing arguments")
     except Exception:
         logger.error("Failed to parse arguments", exc_info=True)
@@ -153,80 +618,41 @@ if __name__ == "__main__":
         with open(str(ce_src), "rb") as f:
             ce_obj = pickle.load(f)
         selected_n_components = ce_obj["n_components"]
+        weights = None
+        if moe_weighted:
+            weights = get_reliability_weights(df_orig, pd.read_pickle(moe_src)).values
+        warm_start = None
+        if warm_start_dir is not None:
+            warm_start = load_warm_start(warm_start_dir, selected_n_components)
+        redundant = None
+        if (PRUNE_CORR is not None) and redundant_src.exists():
+            # a map left over from an earlier pruned run would list columns this run kept
+            redundant = pd.read_csv(redundant_src, index_col="feature")
         logger.debug("Finished loading data")
     except Exception:
         logger.error("Failed to load data", exc_info=True)
         raise
 
-    # @@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@
-    print("Train Corex model using selected number of components")
-    try:
-        ce_model = lc.Corex(
-            n_hidden=selected_n_components,
-            gaussianize="outliers",
-            verbose=True,
-            seed=RANDOM_STATE,
-        )
-        ce_model.fit(
-            df.sample(N_SAMPLES, random_state=RANDOM_STATE, replace=True).values
-        )
-    except Exception:
-        logger.error("Failed to train Corex model", exc_info=True)
-        raise
-
-    # @@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@
-    print("Map hidden layers to original features")
-    try:
-        index = [x + 1 for x in range(selected_n_components)]
-        ce_map = (
-            pd.Series(ce_model.clusters(), index=df.columns, name="component")
-            .to_frame()
-            .sort_index()
-            .sort_values(by="component")
-        )
-    except Exception:
-        logger.error("Failed to map hidden layers to original features", exc_info=True)
-        raise
-
-    # @@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@
-    print("Select optimal number of clusters and train best model")
-    try:
-        X = pd.DataFrame(ce_model.transform(df), index=df.index)
-        outputs = train_gaussian_mixture_models(
-            X, list(range(2, max_components)), random_state
-        )
-        bic = pd.DataFrame.from_dict(outputs, orient="index").bic
-        elbow_di = find_elbow(bic)
-        elbow = elbow_di["elbow"]
-        selected_gm_model = outputs[elbow]["model"]
-        logger.debug("Selected optimal number of clusters and trained best model")
-    except Exception:
-        logger.error(
-            "Failed to select optimal number of clusters / train best model",
-            exc_info=True,
-        )
-        raise
+    outputs = cluster_tracts(
+        df,
+        selected_n_components,
+        max_components,
+        random_state,
+        weights=weights,
+        cache=cache,
+        smooth_alpha=smooth_alpha,
+        adjacency_src=adjacency_src,
+        warm_start=warm_start,
+        redundant=redundant,
+        block_size=args.block_size,
+        covariance_types=args.covariance_types,
+        time_budget=args.time_budget,
+    )
 
     # @@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@
     print(f"Save outputs")
     try:
-        # corex and gaussian mixture models
-        with open(str(ce_dst), "wb") as f:
-            pickle.dump(ce_model, f)
-        with open(str(gm_dst), "wb") as f:
-            pickle.dump(selected_gm_model, f)
-        # labeled, scaled data
-        csv_dst = labeled_dst.parents[0] / f"{labeled_dst.stem}.csv"
-        labeled_data = label_data(df, selected_gm_model)
-        labeled_data.to_pickle(labeled_dst)
-        labeled_data.to_csv(csv_dst)
-        # labeled, unscaled data
-        csv_dst = labeled_orig_dst.parents[0] / f"{labeled_orig_dst.stem}.csv"
-        labeled_orig_data = label_data(df_orig, selected_gm_model)
-        labeled_orig_data.to_pickle(labeled_orig_dst)
-        labeled_orig_data.to_csv(csv_dst)
-        # corex map of features to hidden layers
-        ce_map.to_csv(ce_map_dst)
+        save_outputs(outputs, df, df_orig, models_dir, processed_dir)
         logger.debug(f"Finished saving outputs")
     except Exception:
         logger.error("Failed to save outputs", exc_info=True)
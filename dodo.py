@@ -20,13 +20,21 @@ from settings import (
     PROCESSED_DIR,
     MODELS_DIR,
     LOG_PATH,
+    IN_PROCESS_PIPELINE,
     ROOT_DIR,
     ACS_SPAN,
     ACS_YEAR,
     RAW_ACS_DATA_DIR,
     RAW_SHAPEFILES_DIR,
+    TIGER_LAYER,
+    TRACT_STORE_DIR,
+    SIMPLIFY_TOLERANCES,
+    TILES_DIR,
+    CONTIGUITY,
     LOOKUPS_SRC,
     RANDOM_STATE,
+    MODEL_DATA_NAME,
+    PRUNE_CORR,
     CE_CUTOFF,
     N_HIDDEN,
     N_SAMPLES,
@@ -62,10 +70,12 @@ def task_get_tiger_files():
     fips = """1, 2, 4, 5, 6, 8, 9, 10, 11, 12, 13, 15, 16, 17, 18, 19, 20, 21, 22, 23, 24, 25, 26, 27, 28, 29, 30, 31, 32, 33, 34, 35, 36, 37, 38, 39, 40, 41, 42, 44, 45, 46, 47, 48, 49, 50, 51, 53, 54, 55, 56, 60, 66, 69, 72, 78"""
     fips = [x.strip().zfill(2) for x in fips.split(",") if len(x) > 0]
     url_template = Template(
-        "https://www2.census.gov/geo/tiger/TIGER${year}/TRACT/tl_${year}_${fip}_tract.zip"
+        "https://www2.census.gov/geo/tiger/TIGER${year}/${layer_dir}/tl_${year}_${fip}_${layer}.zip"
     )
     for fip in fips:
-        url = url_template.substitute(year=ACS_YEAR, fip=fip)
+        url = url_template.substitute(
+            year=ACS_YEAR, fip=fip, layer=TIGER_LAYER, layer_dir=TIGER_LAYER.upper()
+        )
         fn = url.split("/")[-1]
         dst = RAW_SHAPEFILES_DIR / fn
         yield dict(
@@ -77,6 +87,36 @@ def task_get_tiger_files():
         )
 
 
+@logger.catch
+def task_build_tract_store():
+    """Convert TIGER tract shapefiles into one geoid-indexed geometry store with a spatial index.
+    To run, cd into root dir and type `doit build_tract_store`.
+    """
+    file_dep = sorted(RAW_SHAPEFILES_DIR.glob(f"*_{TIGER_LAYER}.zip"))
+    targets = [TRACT_STORE_DIR / f"tracts__{x}.pkl" for x in ["full"] + SIMPLIFY_TOLERANCES]
+    targets += [TRACT_STORE_DIR / "rtree.dat", TRACT_STORE_DIR / "rtree.idx"]
+    cmd = f"python build_tract_store.py -i {RAW_SHAPEFILES_DIR} -o {TRACT_STORE_DIR} -l {TIGER_LAYER}"
+    return dict(
+        actions=[cmd],
+        file_dep=file_dep,
+        task_dep=["get_tiger_files"],
+        targets=targets,
+        verbosity=2,
+        clean=True,
+    )
+
+
+@logger.catch
+def task_build_adjacency():
+    """Build and cache a sparse tract contiguity matrix from the geometry store.
+    To run, cd into root dir and type `doit build_adjacency`.
+    """
+    src = TRACT_STORE_DIR / "tracts__full.pkl"
+    dst = TRACT_STORE_DIR / f"adjacency__{CONTIGUITY}.pkl"
+    cmd = f"python build_adjacency.py -c {CONTIGUITY} -s {TRACT_STORE_DIR}"
+    return dict(actions=[cmd], file_dep=[src], targets=[dst], verbosity=2, clean=True)
+
+
 @logger.catch
 def task_download_acs():
     """Download American Community Survey (ACS) data.
@@ -101,6 +141,8 @@ def task_parse_acs():
     """Parse downloaded ACS data.
     To run, cd into root dir and type `doit parse_acs`.
     """
+    if IN_PROCESS_PIPELINE:
+        return dict(actions=None, task_dep=["pipeline"])
     # TODO: Refactor so that parse_acs.py uses pydoit dependency manaagement framework
     cmd = "python parse_acs.py"
     # file_dep = f"{ACS_YEAR}_{ACS_SPAN}y_lookup.txt"
@@ -110,6 +152,8 @@ def task_parse_acs():
 @logger.catch
 def task_scale_and_impute_data():
     """Scale and impute missing data"""
+    if IN_PROCESS_PIPELINE:
+        return dict(actions=None, task_dep=["pipeline"])
     i = INTERIM_DIR / "acs__preprocessed_tables.pkl"  # input_src, aka `i`
     m = MODELS_DIR / "scaler_imputer.pkl"  # models_dst, aka `m`
     o = PROCESSED_DIR / "scaled_imputed_data.pkl"  # output_dst, aka `o`
@@ -118,13 +162,26 @@ def task_scale_and_impute_data():
     return dict(actions=[cmd], file_dep=[i], targets=[o], verbosity=2, clean=True)
 
 
+def task_prune_features():
+    """Drop near-duplicate columns before Corex; only defined when PRUNE_CORR is set"""
+    if (PRUNE_CORR is None) or IN_PROCESS_PIPELINE:
+        return
+    i = PROCESSED_DIR / "scaled_imputed_data.pkl"
+    o = PROCESSED_DIR / MODEL_DATA_NAME
+    m = MODELS_DIR / "redundant_features.csv"
+    cmd = f"python prune_features.py -i {i} -o {o} -m {m} -t {PRUNE_CORR}"
+    yield dict(name="prune", actions=[cmd], file_dep=[i], targets=[o, m], verbosity=2, clean=True)
+
+
 @logger.catch
 def task_select_n_components():
     """Select number of components to use for dimensionality reduction"""
+    if IN_PROCESS_PIPELINE:
+        return dict(actions=None, task_dep=["pipeline"])
     cmd = f"python select_n_components.py"
     c = CE_CUTOFF
     d = N_HIDDEN
-    i = PROCESSED_DIR / "scaled_imputed_data.pkl"
+    i = PROCESSED_DIR / MODEL_DATA_NAME
     n = N_SAMPLES
     o = PROCESSED_DIR / "selected_n_components.json"
     t = N_TRIALS
@@ -132,23 +189,104 @@ def task_select_n_components():
     return dict(actions=[cmd], file_dep=[i], targets=[o], verbosity=2, clean=True)
 
 
-# TODO: #4 Add report generation task that creates a report of model summary statistics
-
-
 def task_cluster():
     """Train set of Gaussian Mixture models, select best one, and cluster tracts"""
-    src = PROCESSED_DIR / "scaled_imputed_data.pkl"
+    if IN_PROCESS_PIPELINE:
+        return dict(actions=None, task_dep=["pipeline"])
+    src = PROCESSED_DIR / MODEL_DATA_NAME
     orig_src = INTERIM_DIR / "acs__preprocessed_tables.pkl"
     corex_obj_src = PROCESSED_DIR / "selected_n_components.pkl"
     gm_dst = MODELS_DIR / "gaussian_mixture.pkl"
     ce_dst = MODELS_DIR / "corex.pkl"
     labeled_dst = PROCESSED_DIR / "labeled.pkl"
     labeled_orig_dst = PROCESSED_DIR / "labeled_orig.pkl"
+    neighbors_dst = MODELS_DIR / "similar_tracts.pkl"
     cmd = f"python cluster.py"
     return dict(
         actions=[cmd],
         file_dep=[src, orig_src, corex_obj_src],
-        targets=[gm_dst, ce_dst, labeled_dst, labeled_orig_dst],
+        targets=[gm_dst, ce_dst, labeled_dst, labeled_orig_dst, neighbors_dst],
+        verbosity=2,
+        clean=True,
+    )
+
+
+def task_pipeline():
+    """Parse, scale / impute, prune, select components, and cluster in one process with pipeline.py.
+    Only defined when IN_PROCESS_PIPELINE is set; parse_acs through cluster then just depend on it.
+    """
+    if not IN_PROCESS_PIPELINE:
+        return
+    zips = sorted(RAW_ACS_DATA_DIR.glob("*.zip"))
+    checkpoints = ["scaled_imputed_data", "selected_n_components"]
+    targets = [
+        MODELS_DIR / "scaler_imputer.pkl",
+        MODELS_DIR / "corex.pkl",
+        MODELS_DIR / "gaussian_mixture.pkl",
+        MODELS_DIR / "similar_tracts.pkl",
+        PROCESSED_DIR / "labeled.pkl",
+        PROCESSED_DIR / "labeled_orig.pkl",
+        PROCESSED_DIR / "scaled_imputed_data.pkl",
+        PROCESSED_DIR / "selected_n_components.pkl",
+    ]
+    if PRUNE_CORR is not None:
+        checkpoints.append("pruned_data")
+        targets += [PROCESSED_DIR / MODEL_DATA_NAME, MODELS_DIR / "redundant_features.csv"]
+    cmd = f"python pipeline.py -k {' '.join(checkpoints)}"
+    yield dict(
+        name="run",
+        actions=[cmd],
+        file_dep=zips + [LOOKUPS_SRC],
+        targets=targets,
+        task_dep=["makedirs"],
+        verbosity=2,
+        clean=True,
+    )
+
+
+def task_report():
+    """Build the per-cluster, per-state profile cube and a model summary report"""
+    src = PROCESSED_DIR / "labeled_orig.pkl"
+    gm_src = MODELS_DIR / "gaussian_mixture.pkl"
+    cube_dst = PROCESSED_DIR / "profile_cube.npz"
+    report_dst = PROCESSED_DIR / "model_summary.md"
+    cmd = f"python report.py"
+    return dict(
+        actions=[cmd],
+        file_dep=[src, gm_src],
+        targets=[cube_dst, report_dst],
+        verbosity=2,
+        clean=True,
+    )
+
+
+def task_build_tiles():
+    """Render the cluster map tile pyramid; only tiles whose tracts or labels changed are rewritten.
+    To view the map, run `python -m http.server -d data/processed/tiles` and open http://localhost:8000.
+    """
+    src = PROCESSED_DIR / "labeled.pkl"
+    file_dep = [src] + [TRACT_STORE_DIR / f"tracts__{x}.pkl" for x in ["full"] + SIMPLIFY_TOLERANCES]
+    cmd = f"python build_tiles.py -i {src} -s {TRACT_STORE_DIR} -o {TILES_DIR}"
+    return dict(
+        actions=[cmd],
+        file_dep=file_dep,
+        targets=[TILES_DIR / "manifest.json", TILES_DIR / "index.html"],
+        verbosity=2,
+    )
+
+
+def task_stability():
+    """Refit the selected Gaussian Mixture model on bootstrap resamples and score cluster stability"""
+    src = PROCESSED_DIR / MODEL_DATA_NAME
+    ce_src = MODELS_DIR / "corex.pkl"
+    gm_src = MODELS_DIR / "gaussian_mixture.pkl"
+    tracts_dst = PROCESSED_DIR / "stability_tracts.pkl"
+    clusters_dst = PROCESSED_DIR / "stability_clusters.csv"
+    cmd = f"python stability.py"
+    return dict(
+        actions=[cmd],
+        file_dep=[src, ce_src, gm_src],
+        targets=[tracts_dst, clusters_dst],
         verbosity=2,
         clean=True,
     )
@@ -8,14 +8,109 @@ import pandas as pd
 
 # local imports
 from settings import (
+    ARCHIVE_CACHE_DIR,
+    ARCHIVE_CACHE_MAX_BYTES,
+    EXTRACT_ARCHIVES,
     RAW_ACS_DATA_DIR,
     INTERIM_DIR,
     ACS_SPAN,
     ACS_YEAR,
+    DTYPE,
+    GEOID_LENGTHS,
+    GEOS_CACHE_DIR,
     LOOKUPS_SRC,
+    NULL_THRESH,
+    PARSE_MOE,
     PROCESSED_DIR,
+    SUMMARY_LEVEL,
 )
 from src.acs import ACS
+from src.archive import ArchiveCache
+
+
+def load_acs(
+    acs_year,
+    acs_span,
+    raw_acs_data_dir,
+    interim_dir,
+    lookups_src,
+    summary_level=SUMMARY_LEVEL,
+    extract=EXTRACT_ARCHIVES,
+) -> ACS:
+    """Instantiate ACS for a summary level and load its zips, geographies, and lookups"""
+    acs = ACS(
+        acs_year,
+        acs_span,
+        raw_acs_data_dir,
+        interim_dir,
+        lookups_src,
+        overwrite=False,
+        verbose=False,
+        geoid_length=GEOID_LENGTHS[summary_level],
+        dtype=DTYPE,
+        archive=ArchiveCache(ARCHIVE_CACHE_DIR, ARCHIVE_CACHE_MAX_BYTES, extract=extract),
+        geos_cache_dir=GEOS_CACHE_DIR,
+    )
+    acs.get_data_zips()
+    acs.get_geos()
+    acs.get_lookups()
+    return acs
+
+
+def parse_and_preprocess(acs: ACS, states=None, null_thresh=NULL_THRESH, moe=PARSE_MOE, projection=True) -> ACS:
+    """Parse, join, and preprocess tables; afterwards acs.preprocessed_acs_data (and preprocessed_moe_data, with `moe`)
+    hold the preprocessed frames in memory as well as on disk
+    """
+    # @@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@
+    print("Parse tables")
+    try:
+        plan = acs.get_projection_plan(null_thresh) if projection else None
+        if plan is not None:
+            n_dropped = sum(len(v) == 0 for v in plan.values())
+            logger.debug(f"Projection plan skips {n_dropped} of {len(plan)} profiled tables")
+        acs.parse_tables(states=states, plan=plan, moe=moe)
+        logger.debug(f"Finished parsing tables; refreshed shards: {acs.refreshed_states}")
+        acs.archive.log_stats()
+    except Exception:
+        logger.error("Failed to parse tables", exc_info=True)
+        raise
+
+    # @@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@
+    print("Join tables")
+    try:
+        acs.join_tables(states=states, plan=plan, moe=moe)
+        logger.debug(f"Joined tables; rejoined shards: {acs.refreshed_states}")
+    except Exception:
+        logger.error("Failed to join tables", exc_info=True)
+        raise
+
+    # @@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@
+    print("Preprocess tables")
+    try:
+        acs.preprocess_tables(null_thresh=null_thresh, moe=moe)
+        logger.debug('Preprocessed tables')
+    except Exception:
+        logger.error("Failed to preprocess tables", exc_info=True)
+        raise
+
+    # @@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@
+    print("Summarize failed tables")
+    try:
+        failed = sorted({x["table_id"] for x in acs.failures.values()})
+        skipped = sorted({x["table_id"] for x in acs.skipped_failures})
+        seconds_saved = sum(x["seconds"] for x in acs.skipped_failures)
+        for table_id in failed:
+            records = [x for x in acs.failures.values() if x["table_id"] == table_id]
+            print(f"  {table_id}: {records[0]['exception']} in {len(records)} shard(s): {records[0]['message']}")
+        print(
+            f"{len(failed)} table(s) failed; skipped {len(skipped)} known-bad table(s) "
+            f"in {len(acs.skipped_failures)} shard(s), saving ~{seconds_saved:.1f}s"
+        )
+        logger.debug(f"Failed tables: {failed}; skipped known-bad tables: {skipped}; saved {seconds_saved:.1f}s")
+    except Exception:
+        logger.error("Failed to summarize failed tables", exc_info=True)
+        raise
+    return acs
 
 
 if __name__ == "__main__":
@@ -63,6 +158,13 @@ if __name__ == "__main__":
             help="Specify which year of ACS data you want",
             type=int,
         )
+        parser.add_argument(
+            "-g",
+            "--summary_level",
+            default=SUMMARY_LEVEL,
+            choices=list(GEOID_LENGTHS),
+            help="Geography to parse (tract or block_group)",
+        )
         parser.add_argument(
             "-y",
             "--acs_year",
@@ -70,6 +172,40 @@ if __name__ == "__main__":
             help="Specify which year of ACS data you want",
             type=int,
         )
+        parser.add_argument(
+            "-m",
+            "--moe",
+            action="store_true",
+            default=PARSE_MOE,
+            help="Also extract margin-of-error tables in the same pass as the estimates",
+        )
+        parser.add_argument(
+            "-n",
+            "--null_thresh",
+            default=NULL_THRESH,
+            help="Drop columns with this many or more missing values",
+            type=int,
+        )
+        parser.add_argument(
+            "-P",
+            "--no_projection",
+            action="store_true",
+            help="Parse every cell instead of only the cells that survived preprocessing in a previous run",
+        )
+        parser.add_argument(
+            "-S",
+            "--states",
+            default=None,
+            help="Only parse and join these states' shards (e.g., md va); other shards are reused as-is",
+            nargs="*",
+        )
+        parser.add_argument(
+            "-x",
+            "--no_extract",
+            action="store_true",
+            default=not EXTRACT_ARCHIVES,
+            help="Inflate zip members on every read instead of extracting them once into the archive cache",
+        )
         args = parser.parse_args()
         lookups_input_src = args.lookups_input_src
         raw_acs_data_dir = args.raw_acs_data_dir
@@ -77,6 +213,12 @@ if __name__ == "__main__":
         acs_span = args.acs_span
         acs_year = args.acs_year
         processed_dir = args.processed_dir
+        summary_level = args.summary_level
+        states = args.states
+        null_thresh = args.null_thresh
+        moe = args.moe
+        no_projection = args.no_projection
+        extract = not args.no_extract
         logger.debug("Finish parsing arguments")
     except Exception:
         logger.error("Failed to parse arguments", exc_info=True)
@@ -85,46 +227,18 @@ if __name__ == "__main__":
     # @@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@
     print("Get zips, geos, and lookups data")
     try:
-        acs = ACS(
+        acs = load_acs(
             acs_year,
             acs_span,
             raw_acs_data_dir,
             interim_dir,
             lookups_input_src,
-            overwrite=False,
-            verbose=False,
+            summary_level=summary_level,
+            extract=extract,
         )
-        acs.get_data_zips()
-        acs.get_geos()
-        acs.get_lookups()
         logger.debug("Finish getting zips, geos, and lookups data")
     except Exception:
         logger.error("Failed to get zips / geos / lookups data", exc_info=True)
         raise
 
-    # @@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@
-    print("Parse tables")
-    try:
-        acs.parse_tables()
-        logger.debug("Finished parsing tables")
-    except Exception:
-        logger.error("Failed to parse tables", exc_info=True)
-        raise
-
-    # @@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@
-    print("Join tables")
-    try:
-        acs.join_tables()
-        logger.debug('Joined tables')
-    except Exception:
-        logger.error("Failed to join tables", exc_info=True)
-        raise
-
-    # @@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@
-    print("Preprocess tables")
-    try:
-        acs.preprocess_tables()
-        logger.debug('Preprocessed tables')
-    except Exception:
-        logger.error("Failed to preprocess tables", exc_info=True)
-        raise
\ No newline at end of file
+    parse_and_preprocess(acs, states=states, null_thresh=null_thresh, moe=moe, projection=not no_projection)
@@ -0,0 +1,247 @@
+# standard library imports
+import argparse
+from pathlib import Path
+import pickle
+import time
+
+# third-party imports
+from loguru import logger
+
+# local imports
+from settings import (
+    ACS_SPAN,
+    ACS_YEAR,
+    CE_CUTOFF,
+    CONTIGUITY,
+    DIRS,
+    FIT_CACHE_DIR,
+    FIT_CACHE_MAX_BYTES,
+    INTERIM_DIR,
+    LOOKUPS_SRC,
+    MAX_COMPONENTS,
+    MAX_CV,
+    MODEL_DATA_NAME,
+    MODELS_DIR,
+    MOE_WEIGHTED,
+    N_HIDDEN,
+    N_SAMPLES,
+    N_TRIALS,
+    NULL_THRESH,
+    PARSE_MOE,
+    PROCESSED_DIR,
+    PRUNE_BLOCK_SIZE,
+    PRUNE_CORR,
+    PRUNE_N_SAMPLES,
+    RANDOM_STATE,
+    RAW_ACS_DATA_DIR,
+    SELECTION_MODE,
+    SMOOTH_ALPHA,
+    SUMMARY_LEVEL,
+    SVD_CRITERION,
+    SVD_VARIANCE,
+    TRACT_STORE_DIR,
+)
+from src.acs import ACS
+from src.cache import FitCache
+from src.checkpoint import AsyncCheckpointer
+from cluster import cluster_tracts, get_reliability_weights, load_warm_start, save_outputs
+from parse_acs import load_acs, parse_and_preprocess
+from prune_features import find_redundant_columns
+from scale_impute import scale_impute_data
+from select_n_components import find_n_components
+
+CHECKPOINTS = ["scaled_imputed_data", "pruned_data", "selected_n_components"]
+
+
+def save_pickle(obj, dst):
+    with open(str(dst), "wb") as f:
+        pickle.dump(obj, f)
+
+
+if __name__ == "__main__":
+    """Run parse_acs, scale_impute, prune_features, select_n_components, and cluster in one process.
+    Each stage hands its DataFrames to the next in memory; intermediate pickles are only written when requested with
+    -k, on a background thread, so disk round-trips no longer sit between stages
+    """
+    # @@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@
+    print("Configure and instantiate logger")
+    logger.add(
+        f"log_{__file__}.log".replace(".py", ""), backtrace=False, diagnose=False
+    )
+    logger.debug(f"Begin {__file__}")
+
+    # @@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@
+    print("Parse arguments")
+    try:
+        description = "Run the modeling pipeline in one process"
+        parser = argparse.ArgumentParser(description=description)
+        parser.add_argument(
+            "-k",
+            "--checkpoints",
+            default=[],
+            choices=CHECKPOINTS,
+            help="Intermediate outputs to write in the background; final models and labels are always written",
+            nargs="*",
+        )
+        parser.add_argument(
+            "-S",
+            "--states",
+            default=None,
+            help="Only parse and join these states' shards (e.g., md va); other shards are reused as-is",
+            nargs="*",
+        )
+        parser.add_argument(
+            "-d",
+            "--download",
+            action="store_true",
+            help="Download the vintage's ACS files first, skipping those already on disk",
+        )
+        parser.add_argument(
+            "-f",
+            "--no_fit_cache",
+            action="store_true",
+            help="Refit every model instead of loading identical fits from the fit cache",
+        )
+        parser.add_argument(
+            "-W",
+            "--warm_start_dir",
+            default=None,
+            help="Models directory of a previous vintage to warm-start the cluster stage from",
+            type=Path,
+        )
+        args = parser.parse_args()
+        cache = None if args.no_fit_cache else FitCache(FIT_CACHE_DIR, FIT_CACHE_MAX_BYTES)
+        checkpointer = AsyncCheckpointer(args.checkpoints)
+        stage_seconds = {}
+        logger.debug("Finish parsing arguments")
+    except Exception:
+        logger.error("Failed to parse arguments", exc_info=True)
+        raise
+
+    # @@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@
+    print("Make directories and download ACS data")
+    try:
+        for dir_ in DIRS:
+            dir_.mkdir(parents=True, exist_ok=True)
+        if args.download:
+            start = time.time()
+            acs = ACS(ACS_YEAR, ACS_SPAN, RAW_ACS_DATA_DIR, INTERIM_DIR, LOOKUPS_SRC, overwrite=False)
+            acs.get_acs_metadata()
+            acs.get_acs_data()
+            stage_seconds["download_acs"] = time.time() - start
+    except Exception:
+        logger.error("Failed to make directories / download ACS data", exc_info=True)
+        raise
+
+    # @@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@
+    print("Parse and preprocess ACS tables")
+    try:
+        start = time.time()
+        acs = load_acs(ACS_YEAR, ACS_SPAN, RAW_ACS_DATA_DIR, INTERIM_DIR, LOOKUPS_SRC, summary_level=SUMMARY_LEVEL)
+        parse_and_preprocess(acs, states=args.states, null_thresh=NULL_THRESH, moe=PARSE_MOE)
+        df_orig = acs.preprocessed_acs_data
+        moes = acs.preprocessed_moe_data if PARSE_MOE else None
+        stage_seconds["parse_acs"] = time.time() - start
+    except Exception:
+        logger.error("Failed to parse / preprocess ACS tables", exc_info=True)
+        raise
+
+    # @@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@
+    print("Scale and impute data")
+    try:
+        start = time.time()
+        cache_dir = MODELS_DIR / "cache"
+        cache_dir.mkdir(exist_ok=True)
+        df, pipe = scale_impute_data(df_orig, RANDOM_STATE, cache_dir, moes=moes, max_cv=MAX_CV)
+        checkpointer.save("scaler_imputer", save_pickle, pipe, MODELS_DIR / "scaler_imputer.pkl", required=True)
+        checkpointer.save("scaled_imputed_data", df.to_pickle, PROCESSED_DIR / "scaled_imputed_data.pkl")
+        stage_seconds["scale_impute"] = time.time() - start
+    except Exception:
+        logger.error("Failed to scale / impute data", exc_info=True)
+        raise
+
+    # @@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@
+    print("Prune redundant columns")
+    try:
+        redundant = None
+        if PRUNE_CORR is not None:
+            start = time.time()
+            redundant = find_redundant_columns(
+                df, PRUNE_CORR, block_size=PRUNE_BLOCK_SIZE, n_samples=PRUNE_N_SAMPLES, random_state=RANDOM_STATE
+            )
+            df = df.drop(columns=redundant.index)
+            checkpointer.save(
+                "redundant_features", redundant.to_csv, MODELS_DIR / "redundant_features.csv", required=True
+            )
+            checkpointer.save("pruned_data", df.to_pickle, PROCESSED_DIR / MODEL_DATA_NAME)
+            stage_seconds["prune_features"] = time.time() - start
+    except Exception:
+        logger.error("Failed to prune redundant columns", exc_info=True)
+        raise
+
+    # @@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@
+    print("Select number of Corex components")
+    try:
+        start = time.time()
+        components_obj = find_n_components(
+            df,
+            SELECTION_MODE,
+            N_TRIALS,
+            N_SAMPLES,
+            N_HIDDEN,
+            CE_CUTOFF,
+            SVD_CRITERION,
+            SVD_VARIANCE,
+            RANDOM_STATE,
+            cache=cache,
+        )
+        checkpointer.save(
+            "selected_n_components", save_pickle, components_obj, PROCESSED_DIR / "selected_n_components.pkl"
+        )
+        stage_seconds["select_n_components"] = time.time() - start
+    except Exception:
+        logger.error("Failed to select number of Corex components", exc_info=True)
+        raise
+
+    # @@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@
+    print("Cluster tracts")
+    try:
+        start = time.time()
+        selected_n_components = components_obj["n_components"]
+        weights = get_reliability_weights(df_orig, moes).values if MOE_WEIGHTED else None
+        warm_start = None
+        if args.warm_start_dir is not None:
+            warm_start = load_warm_start(args.warm_start_dir, selected_n_components)
+        outputs = cluster_tracts(
+            df,
+            selected_n_components,
+            MAX_COMPONENTS,
+            RANDOM_STATE,
+            weights=weights,
+            cache=cache,
+            smooth_alpha=SMOOTH_ALPHA,
+            adjacency_src=TRACT_STORE_DIR / f"adjacency__{CONTIGUITY}.pkl",
+            warm_start=warm_start,
+            redundant=redundant,
+        )
+        checkpointer.save(
+            "cluster_outputs", save_outputs, outputs, df, df_orig, MODELS_DIR, PROCESSED_DIR, required=True
+        )
+        stage_seconds["cluster"] = time.time() - start
+    except Exception:
+        logger.error("Failed to cluster tracts", exc_info=True)
+        raise
+
+    # @@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@
+    print("Wait for checkpoints")
+    try:
+        checkpoint_seconds = checkpointer.wait()
+        logger.debug(
+            "Stage seconds: "
+            + ", ".join(f"{k} {v:.1f}" for k, v in stage_seconds.items())
+            + "; background write seconds: "
+            + ", ".join(f"{k} {v:.1f}" for k, v in checkpoint_seconds.items())
+        )
+    except Exception:
+        logger.error("Failed to write checkpoints", exc_info=True)
+        raise
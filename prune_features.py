@@ -0,0 +1,168 @@
+# standard library imports
+import argparse
+from pathlib import Path
+import time
+
+# third-party imports
+from loguru import logger
+import linearcorex as lc
+import numpy as np
+import pandas as pd
+
+# local imports
+from settings import (
+    MODELS_DIR,
+    N_HIDDEN,
+    N_SAMPLES,
+    PROCESSED_DIR,
+    PRUNE_BLOCK_SIZE,
+    PRUNE_CORR,
+    PRUNE_N_SAMPLES,
+    RANDOM_STATE,
+)
+
+
+def find_redundant_columns(frame: pd.DataFrame, threshold: float, block_size=512, n_samples=None, random_state=None):
+    """Map each redundant column to the earlier, kept column it duplicates.
+    Columns are visited in order; a column is redundant if its absolute correlation with a kept column reaches
+    `threshold`. Correlations are computed one block of `block_size` columns at a time as a matrix product over a
+    sample of `n_samples` rows, so memory stays at block_size x n_columns and no Python loop runs over column pairs.
+    Returns a frame indexed by redundant column with its `representative` and their `corr`.
+    """
+    if (n_samples is not None) and (n_samples < len(frame)):
+        frame = frame.sample(n_samples, random_state=random_state)
+    Z = frame.values.astype(np.float32)
+    Z = Z - Z.mean(axis=0)
+    norms = np.linalg.norm(Z, axis=0)
+    Z = Z / np.where(norms > 0, norms, 1)  # constant columns correlate with nothing
+    n_columns = Z.shape[1]
+    representative = np.full(n_columns, -1)
+    corr = np.zeros(n_columns, dtype=np.float32)
+    for start in range(0, n_columns, block_size):
+        block = np.abs(Z[:, start : start + block_size].T @ Z)  # block_size x n_columns
+        for offset, row in enumerate(block):
+            j = start + offset
+            if representative[j] >= 0:
+                continue
+            # later, still-kept columns that duplicate column j
+            m = row >= threshold
+            m[: j + 1] = False
+            m &= representative < 0
+            representative[m] = j
+            corr[m] = row[m]
+    redundant = np.flatnonzero(representative >= 0)
+    return pd.DataFrame(
+        {
+            "representative": frame.columns[representative[redundant]],
+            "corr": corr[redundant].round(4),
+        },
+        index=pd.Index(frame.columns[redundant], name="feature"),
+    )
+
+
+def time_corex_fit(frame: pd.DataFrame, n_hidden: int, n_samples: int, random_state: int) -> float:
+    """Seconds to fit one Linear Corex model with select_n_components.py's settings"""
+    X = frame.sample(n_samples, random_state=random_state, replace=True).values
+    start = time.time()
+    lc.Corex(n_hidden=n_hidden, gaussianize="outliers", seed=random_state).fit(X)
+    return time.time() - start
+
+
+if __name__ == "__main__":
+    """Drop near-duplicate columns of the scaled, imputed data before Corex"""
+    # @@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@
+    print("Configure and instantiate logger")
+    logger.add(
+        f"log_{__file__}.log".replace(".py", ""), backtrace=False, diagnose=False
+    )
+    logger.debug(f"Begin {__file__}")
+
+    # @@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@
+    print("Parse arguments")
+    try:
+        description = "Prune highly correlated columns before Corex"
+        parser = argparse.ArgumentParser(description=description)
+        parser.add_argument(
+            "-i",
+            "--input_src",
+            default=PROCESSED_DIR / "scaled_imputed_data.pkl",
+            help="Path to scaled, imputed data",
+            type=Path,
+        )
+        parser.add_argument(
+            "-o",
+            "--output_dst",
+            default=PROCESSED_DIR / "pruned_data.pkl",
+            help="Path to save the pruned data",
+            type=Path,
+        )
+        parser.add_argument(
+            "-m",
+            "--mapping_dst",
+            default=MODELS_DIR / "redundant_features.csv",
+            help="Path to save the map of each dropped column to the column it duplicates",
+            type=Path,
+        )
+        parser.add_argument(
+            "-t",
+            "--threshold",
+            default=PRUNE_CORR or 0.98,
+            help="Drop a column whose absolute correlation with an earlier kept column reaches this",
+            type=float,
+        )
+        parser.add_argument(
+            "-b",
+            "--benchmark",
+            action="store_true",
+            help="Time one Corex fit before and after pruning",
+        )
+        args = parser.parse_args()
+        logger.debug("Finish parsing arguments")
+    except Exception:
+        logger.error("Failed to parse arguments", exc_info=True)
+        raise
+
+    # @@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@
+    print("Find redundant columns")
+    try:
+        start = time.time()
+        df = pd.read_pickle(args.input_src)
+        redundant = find_redundant_columns(
+            df,
+            args.threshold,
+            block_size=PRUNE_BLOCK_SIZE,
+            n_samples=PRUNE_N_SAMPLES,
+            random_state=RANDOM_STATE,
+        )
+        df_pruned = df.drop(columns=redundant.index)
+        logger.debug(
+            f"Found {len(redundant)} of {df.shape[1]} columns with |r| >= {args.threshold} "
+            f"in {time.time() - start:.1f}s"
+        )
+    except Exception:
+        logger.error("Failed to find redundant columns", exc_info=True)
+        raise
+
+    # @@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@
+    if args.benchmark:
+        print("Time Corex before and after pruning")
+        try:
+            before = time_corex_fit(df, N_HIDDEN, N_SAMPLES, RANDOM_STATE)
+            after = time_corex_fit(df_pruned, N_HIDDEN, N_SAMPLES, RANDOM_STATE)
+            logger.debug(
+                f"Corex fit on {df.shape[1]} columns: {before:.1f}s; on {df_pruned.shape[1]} columns: {after:.1f}s "
+                f"({before / after:.1f}x)"
+            )
+        except Exception:
+            logger.error("Failed to time Corex", exc_info=True)
+            raise
+
+    # @@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@
+    print("Save outputs")
+    try:
+        df_pruned.to_pickle(args.output_dst)
+        redundant.to_csv(args.mapping_dst)
+        logger.debug("Saved outputs")
+    except Exception:
+        logger.error("Failed to save outputs", exc_info=True)
+        raise
@@ -0,0 +1,123 @@
+# standard library imports
+import argparse
+from pathlib import Path
+import pickle
+
+# third-party imports
+from loguru import logger
+import numpy as np
+import pandas as pd
+
+# local imports
+from settings import MODELS_DIR, POPULATION_COL, PROCESSED_DIR, REPORT_N_FEATURES
+from src.cube import ProfileCube
+
+
+def make_report(cube: ProfileCube, gm_model, n_features: int) -> str:
+    """Write a markdown summary of the clustering model, read entirely from the profile cube"""
+    counts = cube.get("count")
+    means = cube.get("mean")
+    n_tracts = counts.max(axis=1)
+    overall = (means * counts).sum() / counts.sum()
+    lift = means / overall - 1
+    lines = [
+        "# Model summary",
+        "",
+        f"* Gaussian Mixture components: {gm_model.n_components} ({gm_model.covariance_type} covariance)",
+        f"* Tracts: {int(n_tracts.sum())}",
+        f"* Features: {len(cube.features)}",
+        "",
+        "## Cluster sizes",
+        "",
+        "| cluster | tracts | share |",
+        "| --- | --- | --- |",
+    ]
+    for cluster, n in n_tracts.items():
+        lines.append(f"| {cluster} | {int(n)} | {n / n_tracts.sum():.1%} |")
+    lines += ["", "## Most distinctive features", ""]
+    for cluster, row in lift.iterrows():
+        top = row.replace([np.inf, -np.inf], np.nan).dropna()
+        top = top.reindex(top.abs().sort_values(ascending=False).index)[:n_features]
+        lines += [f"### Cluster {cluster}", "", "| feature | cluster mean | lift vs. all tracts |", "| --- | --- | --- |"]
+        for feature, value in top.items():
+            lines.append(f"| {feature} | {means.loc[cluster, feature]:,.2f} | {value:+.0%} |")
+        lines.append("")
+    return "\n".join(lines)
+
+
+if __name__ == "__main__":
+    """Build the cluster profile cube and generate a model summary report from it"""
+    # @@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@
+    print("Configure and instantiate logger")
+    logger.add(
+        f"log_{__file__}.log".replace(".py", ""), backtrace=False, diagnose=False
+    )
+    logger.debug(f"Begin {__file__}")
+
+    # @@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@
+    print("Parse arguments")
+    try:
+        description = "Build cluster profile cube and model summary report"
+        parser = argparse.ArgumentParser(description=description)
+        parser.add_argument(
+            "-m",
+            "--models_dir",
+            default=MODELS_DIR,
+            help="Path to models directory",
+            type=Path,
+        )
+        parser.add_argument(
+            "-n",
+            "--n_features",
+            default=REPORT_N_FEATURES,
+            help="Number of distinctive features to list per cluster",
+            type=int,
+        )
+        parser.add_argument(
+            "-p",
+            "--processed_dir",
+            default=PROCESSED_DIR,
+            help="Path to processed data directory",
+            type=Path,
+        )
+        parser.add_argument(
+            "-w",
+            "--weight_col",
+            default=POPULATION_COL,
+            help="Column used to compute population-weighted means",
+        )
+        args = parser.parse_args()
+        src = args.processed_dir / "labeled_orig.pkl"
+        gm_src = args.models_dir / "gaussian_mixture.pkl"
+        cube_dst = args.processed_dir / "profile_cube.npz"
+        report_dst = args.processed_dir / "model_summary.md"
+        logger.debug("Finish parsing arguments")
+    except Exception:
+        logger.error("Failed to parse arguments", exc_info=True)
+        raise
+
+    # @@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@
+    print("Build profile cube")
+    try:
+        df = pd.read_pickle(src)
+        weight_col = args.weight_col if args.weight_col in df else None
+        if weight_col is None:
+            logger.warning(f"{args.weight_col} not found; skipping population-weighted means")
+        cube = ProfileCube.build(df, weight_col=weight_col)
+        cube.save(cube_dst)
+        logger.debug(f"Saved profile cube of shape {cube.values.shape} to {cube_dst}")
+    except Exception:
+        logger.error("Failed to build profile cube", exc_info=True)
+        raise
+
+    # @@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@
+    print(f"Save report to {report_dst}")
+    try:
+        with open(str(gm_src), "rb") as f:
+            gm_model = pickle.load(f)
+        with open(str(report_dst), "w") as f:
+            f.write(make_report(ProfileCube.load(cube_dst), gm_model, args.n_features))
+        logger.debug(f"Finished saving report to {report_dst}")
+    except Exception:
+        logger.error("Failed to save report", exc_info=True)
+        raise
@@ -6,13 +6,111 @@ import pickle
 
 # third-party imports
 from loguru import logger
+import numpy as np
 import pandas as pd
 from sklearn.impute import SimpleImputer, MissingIndicator
 from sklearn.pipeline import Pipeline
 from sklearn.preprocessing import QuantileTransformer, StandardScaler
 
 # local imports
-from settings import INTERIM_DIR, PROCESSED_DIR, RANDOM_STATE, MODELS_DIR
+from settings import (
+    CHUNK_SIZE,
+    DTYPE,
+    FIT_N_SAMPLES,
+    INTERIM_DIR,
+    MAX_CV,
+    PROCESSED_DIR,
+    RANDOM_STATE,
+    MODELS_DIR,
+)
+from src.acs import ACS
+
+
+def add_missing_indicators(frame: pd.DataFrame, columns=None) -> pd.DataFrame:
+    """Append `mi__` missing-value indicator columns.
+    When fitting, keep only indicators of columns that have missing values; when scoring, pass the fitted `columns`.
+    """
+    mi = MissingIndicator(features="all")
+    mi_columns = [f"mi__{x}" for x in frame]
+    df_mi = pd.DataFrame(mi.fit_transform(frame), columns=mi_columns, index=frame.index)
+    if columns is None:
+        columns = df_mi.sum()[df_mi.sum() > 0].index.values
+    else:
+        columns = [x for x in columns if x.startswith("mi__")]
+    df_mi = df_mi.reindex(columns=columns, fill_value=False)
+    return pd.concat([frame, df_mi], axis=1)
+
+
+def drop_unreliable_columns(frame: pd.DataFrame, moes: pd.DataFrame, max_cv: float) -> pd.DataFrame:
+    """Drop columns whose median coefficient of variation across tracts exceeds `max_cv`"""
+    cv = ACS.coefficient_of_variation(frame, moes.reindex(index=frame.index, columns=frame.columns))
+    median_cv = cv.median()
+    return frame[[x for x in frame if not (median_cv[x] > max_cv)]]
+
+
+def fit_scaler_imputer(frame: pd.DataFrame, random_state: int, cache_dir: Path, n_samples=None):
+    """Fit quantile transformer, median imputer, and standard scaler on preprocessed ACS data.
+    Pass `n_samples` to fit on a random subset of rows, which bounds memory for large geographies.
+    """
+    input_columns = list(frame.columns)
+    # decide indicators on the full frame so a subsample cannot miss a sparsely-null column
+    mi_columns = [f"mi__{x}" for x in frame if frame[x].isnull().any()]
+    if (n_samples is not None) and (n_samples < len(frame)):
+        frame = frame.sample(n_samples, random_state=random_state)
+    frame = add_missing_indicators(frame, columns=mi_columns)
+    subsample = int(len(frame) / 5)
+    n_quantiles = min(
+        1000, subsample - 1
+    )  # default is 1000, use min to ensure < subsample
+    qt = QuantileTransformer(
+        n_quantiles=n_quantiles,
+        output_distribution="normal",
+        subsample=subsample,
+        random_state=random_state,
+    )
+    imputer = SimpleImputer(strategy="median")
+    pipe = Pipeline(
+        steps=[
+            ("quantile_transformer", qt),
+            ("imputer", imputer),
+            ("standard_scaler", StandardScaler()),
+        ],
+        memory=str(cache_dir),
+        verbose=True,
+    )
+    pipe.fit(frame)
+    # remember the fitted layout so that a single state shard can be scored later
+    pipe.input_columns_ = input_columns
+    pipe.feature_columns_ = list(frame.columns)
+    return pipe
+
+
+def scale_impute(frame: pd.DataFrame, pipe, chunk_size=None, dtype=None) -> pd.DataFrame:
+    """Scale and impute preprocessed ACS data with a fitted pipeline.
+    Rows are transformed `chunk_size` at a time into one preallocated array, so the pipeline's float64 temporaries
+    never span the whole frame.
+    """
+    frame = frame.reindex(columns=pipe.input_columns_)
+    chunk_size = len(frame) if chunk_size is None else chunk_size
+    out = np.empty((len(frame), len(pipe.feature_columns_)), dtype=dtype or np.float64)
+    for i in range(0, len(frame), max(chunk_size, 1)):
+        chunk = add_missing_indicators(
+            frame.iloc[i : i + chunk_size], columns=pipe.feature_columns_
+        )
+        out[i : i + chunk_size] = pipe.transform(chunk)
+    return pd.DataFrame(out, index=frame.index, columns=pipe.feature_columns_)
+
+
+def scale_impute_data(frame: pd.DataFrame, random_state: int, cache_dir: Path, moes=None, max_cv=None):
+    """Drop unreliable columns (given `moes` and `max_cv`), fit the scaler / imputer, and apply it.
+    Returns (scaled, imputed frame, fitted pipeline).
+    """
+    if max_cv is not None:
+        n_columns = frame.shape[1]
+        frame = drop_unreliable_columns(frame, moes, max_cv)
+        logger.debug(f"Dropped {n_columns - frame.shape[1]} columns with median CV > {max_cv}")
+    pipe = fit_scaler_imputer(frame, random_state, cache_dir, n_samples=FIT_N_SAMPLES)
+    return scale_impute(frame, pipe, chunk_size=CHUNK_SIZE, dtype=DTYPE), pipe
 
 
 if __name__ == "__main__":
@@ -62,6 +160,20 @@ if __name__ == "__main__":
             help="Directory to save parsed ACS files",
             type=int,
         )
+        parser.add_argument(
+            "-c",
+            "--max_cv",
+            default=MAX_CV,
+            help="Drop columns whose median coefficient of variation exceeds this; requires parsed margins of error",
+            type=float,
+        )
+        parser.add_argument(
+            "-s",
+            "--shard",
+            default=None,
+            help="Score only this state's shard (e.g., md) with the already-fitted model at --model_dst",
+            type=str,
+        )
         args = parser.parse_args()
         input_src = args.input_src
         model_dst = args.model_dst
@@ -70,6 +182,13 @@ if __name__ == "__main__":
         cache_dir.mkdir(exist_ok=True)
         output_dst = args.output_dst
         random_state = args.random_state
+        max_cv = args.max_cv
+        moe_src = input_src.parents[0] / "acs__preprocessed_moes.pkl"
+        shard = args.shard.lower() if args.shard else None
+        if shard is not None:
+            input_src = input_src.parents[0] / "shards" / shard / "acs__tables.pkl"
+            output_dst = output_dst.parents[0] / "shards" / f"{output_dst.stem}__{shard}.pkl"
+            output_dst.parents[0].mkdir(exist_ok=True)
         logger.debug("Finish parsing arguments")
     except Exception:
         logger.error("Failed to parse arguments", exc_info=True)
@@ -78,37 +197,16 @@ if __name__ == "__main__":
     # @@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@
     print("Scale and impute data")
     try:
-        df = pd.read_pickle(input_src)
-        mi = MissingIndicator(features="all")
-        columns = [f"mi__{x}" for x in df]
-        df_mi = pd.DataFrame(mi.fit_transform(df), columns=columns, index=df.index)
-        columns = df_mi.sum()[df_mi.sum() > 0].index.values
-        df_mi = df_mi[columns]
-        df = pd.concat([df, df_mi], axis=1)
-        subsample = int(len(df) / 5)
-        n_quantiles = min(
-            1000, subsample - 1
-        )  # default is 1000, use min to ensure < subsample
-        qt = QuantileTransformer(
-            n_quantiles=n_quantiles,
-            output_distribution="normal",
-            subsample=subsample,
-            random_state=random_state,
-        )
-        imputer = SimpleImputer(strategy="median")
-        pipe = Pipeline(
-            steps=[
-                ("quantile_transformer", qt),
-                ("imputer", imputer),
-                ("standard_scaler", StandardScaler()),
-            ],
-            memory=str(cache_dir),
-            verbose=True,
-        )
-        df_transformed = pipe.fit_transform(df)
-        df_transformed = pd.DataFrame(
-            df_transformed, index=df.index, columns=df.columns
-        )
+        if shard is None:
+            moes = pd.read_pickle(moe_src) if max_cv is not None else None
+            df_transformed, pipe = scale_impute_data(
+                pd.read_pickle(input_src), random_state, cache_dir, moes=moes, max_cv=max_cv
+            )
+        else:
+            df = ACS.clean_tables(pd.read_pickle(input_src))
+            with open(str(model_dst), "rb") as f:
+                pipe = pickle.load(f)
+            df_transformed = scale_impute(df, pipe, chunk_size=CHUNK_SIZE, dtype=DTYPE)
 
         logger.debug("Finish scaling and imputing")
     except Exception:
@@ -119,8 +217,9 @@ if __name__ == "__main__":
     print("Save outputs")
     try:
         df_transformed.to_pickle(output_dst)
-        with open(str(model_dst), "wb") as f:
-            pickle.dump(pipe, f)
+        if shard is None:
+            with open(str(model_dst), "wb") as f:
+                pickle.dump(pipe, f)
         logger.debug("Save outputs")
     except Exception:
         logger.error("Failed to save output(s)", exc_info=True)
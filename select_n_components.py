@@ -5,22 +5,34 @@ import json
 import os
 from pathlib import Path
 import pickle
+import time
 
 # third-party imports
 from loguru import logger
+import numpy as np
 import pandas as pd
-import linearcorex as lc
 from sklearn.decomposition import PCA
 
 # local imports
 from settings import (
     CE_CUTOFF,
+    FIT_CACHE_DIR,
+    FIT_CACHE_MAX_BYTES,
+    MODEL_DATA_NAME,
     N_HIDDEN,
     N_SAMPLES,
+    N_PERMUTATIONS,
     N_TRIALS,
     PROCESSED_DIR,
+    RANDOM_STATE,
+    SELECTION_MODE,
+    SVD_CRITERION,
+    SVD_PRESCREEN_FACTOR,
+    SVD_VARIANCE,
 )
 from src.acs import ACS
+from src.cache import FitCache
+from src.models import fit_corex_model
 
 
 def make_corex_components_summary(
@@ -29,15 +41,14 @@ def make_corex_components_summary(
     n_samples: int,
     n_hidden: int,
     ce_cutoff: float,
+    cache=None,
 ) -> pd.DataFrame:
     """Train multiple Linear Corex models using bootstrapped datasets to determine optimal number of clusters"""
     components_summary = {}
     for random_state in range(n_runs):
         frame = frame.sample(n_samples, random_state=random_state, replace=True)
-        corex_model = lc.Corex(
-            n_hidden=n_hidden, gaussianize="outliers", verbose=True, seed=random_state
-        )
-        corex_model.fit(frame.values)
+        params = dict(n_hidden=n_hidden, gaussianize="outliers", seed=random_state)
+        corex_model = fit_corex_model(params, frame.values, cache=cache)
         s = pd.Series(corex_model.tcs)
         corex_tc = s.rename("tc").to_frame()
         corex_tc["n_components"] = [x + 1 for x in range(len(corex_tc))]
@@ -55,6 +66,56 @@ def make_corex_components_summary(
     return components_summary
 
 
+def make_svd_components_summary(
+    frame: pd.DataFrame,
+    n_samples: int,
+    n_hidden: int,
+    n_permutations: int,
+    random_state: int,
+) -> pd.DataFrame:
+    """Eigenvalues of the top `n_hidden` principal components from a randomized SVD, plus the parallel-analysis
+    threshold: the 95th percentile of the same eigenvalues on copies of the data with each column shuffled separately
+    """
+    X = frame.sample(min(n_samples, len(frame)), random_state=random_state).values.astype(np.float64)
+    n_hidden = min(n_hidden, *X.shape)
+    pca = PCA(n_components=n_hidden, svd_solver="randomized", random_state=random_state).fit(X)
+    rng = np.random.RandomState(random_state)
+    permuted = []
+    for _ in range(n_permutations):
+        X_permuted = np.empty_like(X)
+        for j in range(X.shape[1]):
+            X_permuted[:, j] = rng.permutation(X[:, j])
+        permuted.append(
+            PCA(n_components=n_hidden, svd_solver="randomized", random_state=random_state)
+            .fit(X_permuted)
+            .explained_variance_
+        )
+    summary = pd.DataFrame(
+        {
+            "eigenvalue": pca.explained_variance_,
+            "explained_variance_ratio": pca.explained_variance_ratio_,
+            "cum_explained_variance_ratio": np.cumsum(pca.explained_variance_ratio_),
+            "parallel_threshold": np.percentile(permuted, 95, axis=0),
+        },
+        index=pd.Index([x + 1 for x in range(n_hidden)], name="n_components"),
+    )
+    return summary
+
+
+def select_n_svd_components(svd_summary: pd.DataFrame, criterion: str, variance: float) -> int:
+    """Select number of components from a randomized SVD summary.
+    parallel: components whose eigenvalue beats shuffled data, counted until the first one that does not;
+    variance: fewest components that explain `variance` of the total (all of them if the top components fall short).
+    """
+    if criterion == "parallel":
+        beats_noise = (svd_summary["eigenvalue"] > svd_summary["parallel_threshold"]).values
+        return int(len(beats_noise) if beats_noise.all() else max(beats_noise.argmin(), 1))
+    if criterion == "variance":
+        reached = (svd_summary["cum_explained_variance_ratio"] >= variance).values
+        return int(reached.argmax() + 1 if reached.any() else len(reached))
+    raise ValueError("criterion must be either 'parallel' or 'variance'")
+
+
 def select_n_components(components_summary: dict) -> int:
     """Select number of Linear Corex components"""
     n_components_li = [di['n_components'] for random_state, di in components_summary.items()]
@@ -62,6 +123,73 @@ def select_n_components(components_summary: dict) -> int:
     return n_components
 
 
+def find_n_components(
+    df: pd.DataFrame,
+    mode: str,
+    n_trials: int,
+    n_samples: int,
+    n_hidden: int,
+    ce_cutoff: float,
+    svd_criterion: str,
+    svd_variance: float,
+    random_state: int,
+    compare=False,
+    cache=None,
+) -> dict:
+    """Select the number of Corex components with bootstrapped Corex fits, a randomized SVD, or both.
+    Returns the selection with its summaries and run times, as saved to selected_n_components.pkl.
+    """
+    timings = {}
+    svd_summary, svd_n_components = None, None
+    if (mode != "corex") or compare:
+        start = time.time()
+        svd_summary = make_svd_components_summary(
+            df, n_samples, n_hidden, N_PERMUTATIONS, random_state=random_state
+        )
+        svd_n_components = select_n_svd_components(svd_summary, svd_criterion, svd_variance)
+        timings["svd"] = round(time.time() - start, 1)
+        logger.debug(
+            f"Randomized SVD ({svd_criterion}) chose {svd_n_components} components in {timings['svd']}s"
+        )
+    components_summary, corex_n_components = None, None
+    if (mode != "svd") or compare:
+        corex_n_hidden = n_hidden
+        if mode == "prescreen":
+            corex_n_hidden = min(n_hidden, SVD_PRESCREEN_FACTOR * svd_n_components)
+        start = time.time()
+        components_summary = make_corex_components_summary(
+            df, n_trials, n_samples, corex_n_hidden, ce_cutoff, cache=cache
+        )
+        if cache is not None:
+            cache.log_stats()
+        corex_n_components = select_n_components(components_summary)
+        timings["corex"] = round(time.time() - start, 1)
+        logger.debug(
+            f"Corex TC (n_hidden={corex_n_hidden}) chose {corex_n_components} components in {timings['corex']}s"
+        )
+    n_components = svd_n_components if mode == "svd" else corex_n_components
+    if compare:
+        logger.debug(
+            f"SVD chose {svd_n_components} components in {timings['svd']}s; "
+            f"Corex TC chose {corex_n_components} in {timings['corex']}s"
+        )
+    logger.debug(f"Found optimal number of Corex components: {n_components}")
+    return {
+        "ce_cutoff": ce_cutoff,
+        "n_components": n_components,
+        "n_hidden": n_hidden,
+        "n_samples": n_samples,
+        "n_trials": n_trials,
+        "ce_tc_df": components_summary,
+        "mode": mode,
+        "svd_criterion": svd_criterion,
+        "svd_n_components": svd_n_components,
+        "svd_summary": svd_summary,
+        "corex_n_components": corex_n_components,
+        "seconds": timings,
+    }
+
+
 if __name__ == "__main__":
     # @@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@
     print("Configure and instantiate logger")
@@ -73,7 +201,7 @@ if __name__ == "__main__":
     # @@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@
     print("Parse arguments")
     try:
-        default_input_src = PROCESSED_DIR / "scaled_imputed_data.pkl"
+        default_input_src = PROCESSED_DIR / MODEL_DATA_NAME
         default_output_dst = PROCESSED_DIR / "selected_n_components.pkl"
         description = "Select number of Corex components"
         parser = argparse.ArgumentParser(description=description)
@@ -119,7 +247,41 @@ if __name__ == "__main__":
             help="Number of model run training trials",
             type=int,
         )
+        parser.add_argument(
+            "-f",
+            "--no_fit_cache",
+            action="store_true",
+            help="Refit every model instead of loading identical fits from the fit cache",
+        )
+        parser.add_argument(
+            "-M",
+            "--mode",
+            default=SELECTION_MODE,
+            choices=["corex", "svd", "prescreen"],
+            help="Select with bootstrapped Corex fits, with a randomized SVD only, or with an SVD that caps n_hidden",
+        )
+        parser.add_argument(
+            "-s",
+            "--svd_criterion",
+            default=SVD_CRITERION,
+            choices=["parallel", "variance"],
+            help="Parallel analysis or cumulative explained variance",
+        )
+        parser.add_argument(
+            "-v",
+            "--svd_variance",
+            default=SVD_VARIANCE,
+            help="Explained variance to reach with the variance criterion",
+            type=float,
+        )
+        parser.add_argument(
+            "-b",
+            "--compare",
+            action="store_true",
+            help="Run both the SVD and the Corex selection and log their choices and run times",
+        )
         args = parser.parse_args()
+        cache = None if args.no_fit_cache else FitCache(FIT_CACHE_DIR, FIT_CACHE_MAX_BYTES)
         logger.debug("Finish parsing arguments")
     except Exception:
         logger.error("Failed to parse arguments", exc_info=True)
@@ -129,11 +291,19 @@ if __name__ == "__main__":
     print("Find optimal number of Corex components")
     try:
         df = pd.read_pickle(args.input_src)
-        components_summary = make_corex_components_summary(
-            df, args.n_trials, args.n_samples, args.n_hidden, args.ce_cutoff
+        components_obj = find_n_components(
+            df,
+            args.mode,
+            args.n_trials,
+            args.n_samples,
+            args.n_hidden,
+            args.ce_cutoff,
+            args.svd_criterion,
+            args.svd_variance,
+            RANDOM_STATE,
+            compare=args.compare,
+            cache=cache,
         )
-        n_components = select_n_components(components_summary)
-        logger.debug(f"Found optimal number of Corex components: {n_components}")
     except Exception:
         logger.error("Failed to find optimal number of Corex components", exc_info=True)
         raise
@@ -141,16 +311,8 @@ if __name__ == "__main__":
     # @@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@
     print(f"Save outputs to {args.output_dst}")
     try:
-        di = {
-            "ce_cutoff": args.ce_cutoff,
-            "n_components": n_components,
-            "n_hidden": args.n_hidden,
-            "n_samples": args.n_samples,
-            "n_trials": args.n_trials,
-            "ce_tc_df": components_summary
-        }
         with open(str(args.output_dst), 'wb') as f:
-            pickle.dump(di, f)
+            pickle.dump(components_obj, f)
         logger.debug(f"Finished saving outputs to {args.output_dst}")
     except Exception:
         logger.error("Failed to save outputs", exc_info=True)
@@ -4,32 +4,106 @@ from pathlib import Path
 
 
 CRS = "EPSG:4269"
-ACS_YEAR = 2018
-ACS_SPAN = 5  # 1 or 5
+# vintage to segment; override with the GEOCLUSTERIZER_ACS_YEAR / GEOCLUSTERIZER_ACS_SPAN environment variables
+DEFAULT_ACS_YEAR = 2018
+DEFAULT_ACS_SPAN = 5
+ACS_YEAR = int(os.environ.get("GEOCLUSTERIZER_ACS_YEAR", DEFAULT_ACS_YEAR))
+ACS_SPAN = int(os.environ.get("GEOCLUSTERIZER_ACS_SPAN", DEFAULT_ACS_SPAN))  # 1 or 5
 if ACS_SPAN not in [1, 5]:
     raise ValueError(
         "ACS_SPAN must be either 1 or 5 for 1-year or 5-year ACS datasets, respectively"
     )
+# geography to segment; override with the GEOCLUSTERIZER_SUMMARY_LEVEL environment variable
+SUMMARY_LEVEL = os.environ.get("GEOCLUSTERIZER_SUMMARY_LEVEL", "tract")
+GEOID_LENGTHS = {"tract": 11, "block_group": 12}  # length of the geoid after the "US" in ACS geography files
+TIGER_LAYERS = {"tract": "tract", "block_group": "bg"}  # TIGER shapefile layer of each summary level
+if SUMMARY_LEVEL not in GEOID_LENGTHS:
+    raise ValueError(f"SUMMARY_LEVEL must be one of {list(GEOID_LENGTHS)}")
+TIGER_LAYER = TIGER_LAYERS[SUMMARY_LEVEL]
+LEVEL_DIR = "" if SUMMARY_LEVEL == "tract" else SUMMARY_LEVEL  # tract outputs keep their original locations
+VINTAGE = f"{ACS_YEAR}_{ACS_SPAN}y"
+# other vintages' outputs go to VINTAGE subdirectories; the default vintage keeps the original locations
+VINTAGE_DIR = "" if (ACS_YEAR, ACS_SPAN) == (DEFAULT_ACS_YEAR, DEFAULT_ACS_SPAN) else VINTAGE
 ROOT_DIR = Path(".").absolute()
 DATA_DIR = ROOT_DIR / "data"
 RAW_DIR = DATA_DIR / "raw"
 RAW_ACS_DATA_DIR = RAW_DIR / f"{ACS_YEAR}_{ACS_SPAN}_year_data"
 RAW_SHAPEFILES_DIR = RAW_DIR / f"{ACS_YEAR}_tiger"
-INTERIM_DIR = DATA_DIR / "interim"
+INTERIM_DIR = DATA_DIR / "interim" / VINTAGE_DIR / LEVEL_DIR
+GEOS_CACHE_DIR = DATA_DIR / "interim" / VINTAGE_DIR / "geos"  # parsed geography files, shared by summary levels
 INTERIM_ACS_DST = INTERIM_DIR / 'acs.pkl'
-PROCESSED_DIR = DATA_DIR / "processed"
-MODELS_DIR = ROOT_DIR / "models"
+TRACT_STORE_DIR = INTERIM_DIR / "tract_store"
+PROCESSED_DIR = DATA_DIR / "processed" / VINTAGE_DIR / LEVEL_DIR
+MODELS_DIR = ROOT_DIR / "models" / VINTAGE_DIR / LEVEL_DIR
 LOG_PATH = ROOT_DIR / "log.log"
 LOOKUPS_SRC = ROOT_DIR / '2018_5y_lookup.txt'  # specify which tables you want by modifying this file
 DIRS = [DATA_DIR, RAW_DIR, RAW_ACS_DATA_DIR, RAW_SHAPEFILES_DIR, INTERIM_DIR, PROCESSED_DIR, MODELS_DIR]
 
 RANDOM_STATE = 777
+IN_PROCESS_PIPELINE = False  # have doit run parse_acs through cluster as one pipeline.py task
+
+# ACS archive cache constants; the raw zips are shared by every summary level, so is their cache; each vintage has its
+# own cache (and budget), so vintages parsed concurrently never evict each other's members
+ARCHIVE_CACHE_DIR = DATA_DIR / "interim" / VINTAGE_DIR / "archive_cache"
+ARCHIVE_CACHE_MAX_BYTES = 20 * 1024 ** 3  # least recently used sequences are evicted beyond this size
+EXTRACT_ARCHIVES = True  # inflate zip members once into ARCHIVE_CACHE_DIR instead of on every parse
+
+# fitted model cache constants
+FIT_CACHE_DIR = MODELS_DIR / "cache" / "fits"
+FIT_CACHE_MAX_BYTES = 2 * 1024 ** 3  # least recently used fits are evicted beyond this size
+
+# memory constants; block groups have ~3x as many rows as tracts
+DTYPE = "float32"  # dtype of parsed ACS values and of scaled, imputed data
+CHUNK_SIZE = 20000  # rows scaled / imputed at a time
+TRANSFORM_BLOCK_SIZE = 50000  # rows transformed by Corex / labeled by the Gaussian Mixture per thread at a time
+N_THREADS = int(os.environ.get("GEOCLUSTERIZER_N_THREADS", os.cpu_count()))  # threads for block-wise transforms
+FIT_N_SAMPLES = None if SUMMARY_LEVEL == "tract" else 100000  # rows used to fit the scaler / imputer; None uses all
+GM_N_SAMPLES = None if SUMMARY_LEVEL == "tract" else 100000  # rows used to fit each Gaussian Mixture; None uses all
+
+# preprocessing constants
+NULL_THRESH = {"tract": 20000, "block_group": 60000}[SUMMARY_LEVEL]  # drop columns with this many or more missing values
+PARSE_MOE = False  # also extract margin-of-error tables, aligned with the estimates
+MAX_CV = None  # drop columns whose median coefficient of variation exceeds this (requires PARSE_MOE); None keeps all
+MOE_WEIGHTED = False  # sample the Corex training set in proportion to tract reliability (requires PARSE_MOE)
+
+# redundant feature pruning constants
+PRUNE_CORR = None  # drop columns whose |correlation| with an earlier kept column reaches this (e.g., 0.98); None keeps all
+PRUNE_N_SAMPLES = 50000  # rows used to estimate correlations
+PRUNE_BLOCK_SIZE = 512  # columns correlated at a time
+MODEL_DATA_NAME = "scaled_imputed_data.pkl" if PRUNE_CORR is None else "pruned_data.pkl"  # Corex input, in PROCESSED_DIR
 
 # corex model constants
 N_HIDDEN = 20  # maximum number of corex components
 N_SAMPLES = 40000  # number of samples to draw for each trial
 CE_CUTOFF = 0.01  # cutoff used to select number of corex components
 N_TRIALS = 5  # number of model training trials
+SELECTION_MODE = "corex"  # corex (bootstrapped Corex fits), svd (randomized SVD only), or prescreen (svd bounds corex)
+SVD_CRITERION = "parallel"  # parallel (parallel analysis) or variance (cumulative explained variance)
+SVD_VARIANCE = 0.8  # explained variance to reach with the variance criterion
+N_PERMUTATIONS = 5  # column-permuted copies used by parallel analysis
+SVD_PRESCREEN_FACTOR = 2  # in prescreen mode, Corex fits at most this many times the SVD choice of components
 
 # gaussian mixture components
-MAX_COMPONENTS = 20
\ No newline at end of file
+MAX_COMPONENTS = 20
+COVARIANCE_TYPES = ["full"]  # covariance structures to search alongside n_components, e.g. ["full", "tied", "diag"]
+GM_TIME_BUDGET = None  # seconds for the Gaussian Mixture sweep, keeping the best model fitted in time; None fits all
+
+# tract geometry store constants
+SIMPLIFY_TOLERANCES = [0.0005, 0.005]  # simplification levels, in degrees (CRS units)
+
+# cluster map tile constants
+TILES_DIR = PROCESSED_DIR / "tiles"
+TILE_ZOOMS = list(range(4, 12))  # zoom levels to pre-render; the map scales the last level up beyond it
+
+# spatial smoothing constants
+CONTIGUITY = "queen"  # queen or rook
+SMOOTH_ALPHA = 0.0  # weight of neighbors' posteriors when smoothing cluster labels; 0 turns smoothing off
+SMOOTH_N_ITER = 3  # number of smoothing iterations
+
+# report constants
+POPULATION_COL = "age_sex__b01001__total"  # total population, used for population-weighted means
+REPORT_N_FEATURES = 10  # number of distinctive features to list per cluster
+
+# cluster stability constants
+N_RESAMPLES = 20  # number of bootstrap refits
+N_JOBS = os.cpu_count()  # number of worker processes
@@ -1,9 +1,12 @@
 # standard library imports
 import csv
+import hashlib
 import io
+import json
 import os
 from pathlib import Path
 import sys
+import time
 import urllib.request
 import zipfile
 
@@ -30,6 +33,10 @@ class ACS:
         lookup_src,
         overwrite=False,
         verbose=False,
+        geoid_length=11,
+        dtype=None,
+        archive=None,
+        geos_cache_dir=None,
     ):
         self.acs_year = acs_year
         self.acs_span = acs_span
@@ -40,19 +47,81 @@ class ACS:
         )  # this is a modfied version of what get_acs_metadata method downloads and saves; edit this file to specify which tables you want
         self.overwrite = overwrite
         self.verbose = verbose
+        self.geoid_length = geoid_length  # 11 for tracts, 12 for block groups
+        self.dtype = dtype  # e.g., "float32" to halve the memory of parsed values; None keeps pandas' inference
+        self.archive = archive  # optional src.archive.ArchiveCache; None scans and inflates the zips directly
+        self.geos_cache_dir = None if geos_cache_dir is None else Path(geos_cache_dir)  # None parses geos every run
         self.lookup_url = f"https://www2.census.gov/programs-surveys/acs/summary_file/{acs_year}/documentation/user_tools/ACS_{acs_span}yr_Seq_Table_Number_Lookup.txt"
         self.data_url = f"https://www2.census.gov/programs-surveys/acs/summary_file/{acs_year}/data/{acs_span}_year_by_state"
         self.lookup_path = (
             self.raw_data_dir / f"{acs_year}_{acs_span}y_lookup.txt"
         )  # this is the path to the unmodified lookups table, created by get_acs_metadata method, which we use to parse the acs data
         self.data_zips = []
+        self.state_zips = {}  # lowercase state abbreviation -> zips that carry that state's files
+        self.refreshed_states = []  # shards re-parsed during this run
         self.geos = pd.DataFrame()
         self.lookups = pd.DataFrame()
-        self.acs_data = pd.DataFrame()
-        self.acs_data_dst = self.interim_data_dir / "acs__tables.pkl"
+        self.table_index = None  # table title -> (sequence number, start position, cells), built on first lookup
+        self._acs_data = None  # national frame, assembled lazily from the state shards
+        self._moe_data = None  # national margins of error, assembled lazily like _acs_data
+        self.shards_dir = self.interim_data_dir / "shards"
         self.preprocessed_acs_data_dst = (
             self.interim_data_dir / "acs__preprocessed_tables.pkl"
         )
+        self.preprocessed_moe_data_dst = self.interim_data_dir / "acs__preprocessed_moes.pkl"
+        self.null_profile_dst = self.interim_data_dir / "acs__null_profile.json"
+        self.failures_dst = self.interim_data_dir / "acs__failures.json"
+        self.failures = {}  # state__table_id -> failure record, persisted to failures_dst
+        self.skipped_failures = []  # known-bad tables skipped during this run
+
+    def assemble_shards(self, name, columns=None):
+        """Concatenate the joined state shards (`acs__tables.pkl` or `acs__moes.pkl`) into a national frame.
+        Pass `columns` (names as cleaned by clean_column) to keep only those columns of each shard as it is read,
+        which bounds peak memory.
+        """
+        paths = [self.get_shard_dir(state) / name for state in sorted(self.state_zips)]
+        shards = []
+        for p in paths:
+            if p.exists():
+                shard = pd.read_pickle(p)
+                if columns is not None:
+                    shard = shard[[x for x in shard if self.clean_column(x) in columns]]
+                shards.append(shard)
+        if len(shards) == 0:
+            return pd.DataFrame()
+        return pd.concat(shards, sort=False).sort_index()
+
+    def count_shard_nulls(self, name="acs__tables.pkl"):
+        """Count each column's missing values across shards, one shard in memory at a time.
+        A column absent from a shard counts all of that shard's rows as missing, as it would after concatenation.
+        """
+        counts, n_rows = {}, 0
+        for state in sorted(self.state_zips):
+            p = self.get_shard_dir(state) / name
+            if not p.exists():
+                continue
+            shard = pd.read_pickle(p)
+            shard_counts = shard.isnull().sum()
+            for column in set(counts) - set(shard_counts.index):
+                counts[column] += len(shard)
+            for column, n in shard_counts.items():
+                counts[column] = counts.get(column, n_rows) + n
+            n_rows += len(shard)
+        return pd.Series(counts, dtype=int)
+
+    @property
+    def acs_data(self):
+        """National frame, concatenated from the joined state shards on first access"""
+        if self._acs_data is None:
+            self._acs_data = self.assemble_shards("acs__tables.pkl")
+        return self._acs_data
+
+    @property
+    def moe_data(self):
+        """National margin-of-error frame, aligned with acs_data"""
+        if self._moe_data is None:
+            self._moe_data = self.assemble_shards("acs__moes.pkl")
+        return self._moe_data
 
     @staticmethod
     def download(src, dst, verbose=False):
@@ -78,24 +147,34 @@ class ACS:
                     self.download(self.data_url + "/" + fn, dst, verbose=self.verbose)
         return True
 
-    def find_table(self, table_title, subject_area):
+    def get_table_index(self):
+        """Index every table in the sequence lookup file in one pass, instead of rescanning it for each table"""
+        index = {}
         with open(self.lookup_path, "r", encoding="iso-8859-1") as csvfile:
             reader = csv.DictReader(csvfile, dialect="unix")
-            seq_number, start_pos, cells = None, None, []
             current_table_title = None
             for row in reader:
                 if row["Table Title"] and row["Total Cells in Table"]:
                     current_table_title = row["Table Title"]
-                if current_table_title == table_title and row["Start Position"]:
-                    seq_number = int(row["Sequence Number"])
-                    start_pos = int(row["Start Position"])
-                if current_table_title == table_title and row["Line Number"]:
+                if current_table_title is None:
+                    continue
+                entry = index.setdefault(current_table_title, [None, None, []])
+                if row["Start Position"]:
+                    entry[0] = int(row["Sequence Number"])
+                    entry[1] = int(row["Start Position"])
+                if row["Line Number"]:
                     try:
                         int(row["Line Number"])
-                        cells.append(row["Table Title"])
+                        entry[2].append(row["Table Title"])
                     except:
                         pass
-        return seq_number, start_pos, cells
+        return index
+
+    def find_table(self, table_title, subject_area):
+        if self.table_index is None:
+            self.table_index = self.get_table_index()
+        seq_number, start_pos, cells = self.table_index.get(table_title, (None, None, []))
+        return seq_number, start_pos, list(cells)
 
     def get_data_zips(self):
         self.data_zips = [
@@ -103,34 +182,140 @@ class ACS:
             for x in self.raw_data_dir.iterdir()
             if x.suffix == ".zip"
         ]
+        # each state ships one or more zips; the geography file name (e.g., g20185md.csv) identifies the state
+        self.state_zips = {}
+        if self.archive is not None:
+            self.archive.build([x.filename for x in self.data_zips])
+        for data_zip in self.data_zips:
+            if self.archive is not None:
+                states = self.archive.get_states(data_zip.filename)
+            else:
+                states = {
+                    Path(name).stem[-2:].lower()
+                    for name in data_zip.namelist()
+                    if name.startswith("g") and name.endswith(".csv")
+                }
+            for state in states:
+                self.state_zips.setdefault(state, []).append(data_zip)
         return True
 
-    def get_geos(self):
-        geos = {}
+    def get_shard_dir(self, state):
+        return self.shards_dir / state.lower()
+
+    def get_shard_fingerprint(self, state):
+        """Fingerprint a state's input zips by name, size, and modification time"""
+        stats = []
+        for data_zip in self.state_zips[state]:
+            stat = os.stat(data_zip.filename)
+            stats.append([Path(data_zip.filename).name, stat.st_size, stat.st_mtime_ns])
+        return hashlib.md5(json.dumps(sorted(stats)).encode()).hexdigest()
+
+    def read_shard_manifest(self, state):
+        src = self.get_shard_dir(state) / "manifest.json"
+        if not src.exists():
+            return {}
+        with open(src) as f:
+            return json.load(f)
+
+    def write_shard_manifest(self, state, manifest):
+        with open(self.get_shard_dir(state) / "manifest.json", "w") as f:
+            json.dump(manifest, f, indent=2)
+
+    def get_lookups_fingerprint(self):
+        """Fingerprint the lookup files that define the tables and cells"""
+        h = hashlib.md5()
+        for src in [self.lookup_src, self.lookup_path]:
+            if src.exists():
+                h.update(src.read_bytes())
+        return h.hexdigest()
+
+    def get_inputs_fingerprint(self):
+        """Fingerprint every state's input zips plus the lookup files"""
+        h = hashlib.md5()
+        for state in sorted(self.state_zips):
+            h.update(self.get_shard_fingerprint(state).encode())
+        h.update(self.get_lookups_fingerprint().encode())
+        return h.hexdigest()
+
+    def read_failures(self):
+        if not self.failures_dst.exists():
+            return {}
+        with open(self.failures_dst) as f:
+            return json.load(f)
+
+    def write_failures(self):
+        with open(self.failures_dst, "w") as f:
+            json.dump(self.failures, f, indent=2)
+        return True
+
+    def read_null_profile(self):
+        """Get cached per-column null counts of the national frame, or {} if missing or the inputs changed"""
+        if not self.null_profile_dst.exists():
+            return {}
+        with open(self.null_profile_dst) as f:
+            profile = json.load(f)
+        if profile.get("fingerprint") != self.get_inputs_fingerprint():
+            return {}
+        return profile["null_counts"]
+
+    def write_null_profile(self, null_counts):
+        """Cache null counts, keeping counts of tables that a projection plan skipped in this run"""
+        profile = self.read_null_profile()
+        profile.update({k: int(v) for k, v in null_counts.items()})
+        with open(self.null_profile_dst, "w") as f:
+            json.dump(
+                {"fingerprint": self.get_inputs_fingerprint(), "null_counts": profile},
+                f,
+                indent=2,
+            )
+        return True
+
+    def get_projection_plan(self, null_thresh):
+        """Map table_id -> columns that will survive preprocess_tables, based on the cached null profile.
+        Returns None (parse everything) when there is no profile for the current inputs. Tables missing from the
+        profile, e.g., newly selected in the lookups file, are left out of the plan and so are parsed in full.
+        """
+        null_counts = self.read_null_profile()
+        if len(null_counts) == 0:
+            return None
+        plan = {}
+        for column, n in null_counts.items():
+            if len(column.split("__")) < 3:
+                continue  # geography columns
+            table_id = column.split("__")[1]
+            plan.setdefault(table_id, [])
+            if n < null_thresh:
+                plan[table_id].append(column)
+        return plan
+
+    def get_geos_fingerprint(self):
+        """Fingerprint all of the vintage's zips by name, size, and modification time"""
+        stats = []
         for data_zip in self.data_zips:
-            for info in data_zip.infolist():
-                if info.filename.startswith("g") and info.filename.endswith(".csv"):
-                    with data_zip.open(info.filename) as csvfile:
-                        if self.verbose:
-                            print(
-                                "Parsing geography data for",
-                                info.filename,
-                                file=sys.stderr,
-                            )
-                        data = csvfile.read()
-                        buf = io.StringIO(data.decode("iso-8859-1"))
-                        reader = csv.reader(buf, dialect="unix")
-                        for row in reader:
-                            geos[(row[1], row[4])] = {
-                                "geo_label": row[-4],
-                                "geoid": row[-5].split("US")[-1],
-                            }
-        self.geos = pd.DataFrame.from_dict(geos, orient="index")
-        self.geos.reset_index(inplace=True)
-        self.geos.rename(
-            columns={"level_0": "state_abbr", "level_1": "logrecno"}, inplace=True
-        )
-        m = self.geos["geoid"].apply(lambda x: len(x)) == 11
+            stat = os.stat(data_zip.filename)
+            stats.append([Path(data_zip.filename).name, stat.st_size, stat.st_mtime_ns])
+        return hashlib.md5(json.dumps(sorted(stats)).encode()).hexdigest()
+
+    def get_geos(self):
+        """Load every geography of the vintage, then keep those of this summary level.
+        With a geos_cache_dir, the parsed geography files are cached there until the zips change, so later runs and
+        other summary levels of the same vintage skip re-reading them.
+        """
+        geos_dst = None
+        if self.geos_cache_dir is not None:
+            geos_dst = self.geos_cache_dir / f"geos__{self.get_geos_fingerprint()}.pkl"
+        if (geos_dst is not None) and geos_dst.exists() and (not self.overwrite):
+            self.geos = pd.read_pickle(geos_dst)
+        else:
+            self.geos = self.parse_geos()
+            if geos_dst is not None:
+                self.geos_cache_dir.mkdir(parents=True, exist_ok=True)
+                for src in self.geos_cache_dir.glob("geos__*.pkl"):
+                    src.unlink(missing_ok=True)  # stale zips
+                tmp = geos_dst.with_suffix(f".{os.getpid()}.tmp")
+                self.geos.to_pickle(tmp)
+                os.replace(tmp, geos_dst)  # concurrent runs of the same vintage never read a partial file
+        m = self.geos["geoid"].apply(lambda x: len(x)) == self.geoid_length
         self.geos = self.geos[m]
         self.geos["state_abbr__logrecno"] = (
             self.geos["state_abbr"] + "__" + self.geos["logrecno"]
@@ -139,6 +324,36 @@ class ACS:
 
         return True
 
+    def parse_geos(self):
+        """Parse the geography file of every zip into one frame of state_abbr, logrecno, geo_label, and geoid"""
+        geos = {}
+        for data_zip in self.data_zips:
+            if self.archive is not None:
+                filenames = self.archive.find(data_zip.filename, "g")
+            else:
+                filenames = [
+                    x
+                    for x in data_zip.namelist()
+                    if x.startswith("g") and x.endswith(".csv")
+                ]
+            for filename in filenames:
+                if self.verbose:
+                    print("Parsing geography data for", filename, file=sys.stderr)
+                data = self.read_archive_member(data_zip, filename)
+                buf = io.StringIO(data.decode("iso-8859-1"))
+                reader = csv.reader(buf, dialect="unix")
+                for row in reader:
+                    geos[(row[1], row[4])] = {
+                        "geo_label": row[-4],
+                        "geoid": row[-5].split("US")[-1],
+                    }
+        geos = pd.DataFrame.from_dict(geos, orient="index")
+        geos.reset_index(inplace=True)
+        geos.rename(
+            columns={"level_0": "state_abbr", "level_1": "logrecno"}, inplace=True
+        )
+        return geos
+
     def get_lookups(self):
         self.lookups = pd.read_csv(self.lookup_src, comment="#")
         self.lookups.columns = [
@@ -182,47 +397,79 @@ class ACS:
         )
         return True
 
-    def parse_table(self, table_title, subject_area, subject_abbr):
+    def read_archive_member(self, data_zip, filename):
+        """Return a zip member's bytes, through the extract cache if there is one"""
+        if self.archive is not None:
+            return self.archive.read(data_zip, filename)
+        with data_zip.open(filename) as f:
+            return f.read()
+
+    def read_member(self, data_zip, filename, col_i, col_j, cells):
+        """Read one estimate (e*) or margin-of-error (m*) member into {state__logrecno: {cell: value}}"""
+        rows = {}
+        if self.verbose:
+            print("Parsing data for", filename, file=sys.stderr)
+        data = self.read_archive_member(data_zip, filename)
+        buf = io.StringIO(data.decode("iso-8859-1"))
+        reader = csv.reader(buf, dialect="unix")
+        for row in reader:
+            state = row[2].upper()
+            logical_record_number = row[5]
+            try:
+                values = [
+                    int(value)
+                    if (value and value != "." and int(value) > 0)
+                    else None
+                    for value in row[col_i:col_j]
+                ]
+            except ValueError:
+                values = [
+                    float(value)
+                    if (value and value != "." and float(value) >= 0)
+                    else None
+                    for value in row[col_i:col_j]
+                ]
+            key = f"{state}__{logical_record_number}"
+            rows[key] = {k: v for k, v in zip(cells, values) if v is not None}
+        return rows
+
+    def parse_table(
+        self, table_title, subject_area, subject_abbr, state=None, columns=None, moe=False
+    ):
+        """Parse one table, restricted to a single state's zips if `state` is given.
+        If `columns` is given, only those columns are built into the frame. Rows with a missing cell are still dropped
+        across all of the table's cells first, so the kept columns match a full parse.
+        If `moe` is True, the matching margin-of-error member is read while each zip is open and a (table, moe_table)
+        tuple is returned; moe_table has the same index and columns as table.
+        """
         if (len(self.geos) == 0) or (len(self.lookups) == 0):
             raise ValueError(
                 "Must run get_geos AND get_lookups methods before running parse_table method"
             )
         seq_number, start_pos, cells = self.find_table(table_title, subject_area)
-        table = {}
-        for data_zip in self.data_zips:
-            for info in data_zip.infolist():
-                if info.filename.startswith("e") and info.filename.endswith(
-                    "%04d000.txt" % seq_number
-                ):
-                    with data_zip.open(info.filename) as csvfile:
-                        if self.verbose:
-                            print("Parsing data for", info.filename, file=sys.stderr)
-                        data = csvfile.read()
-                        buf = io.StringIO(data.decode("iso-8859-1"))
-                        reader = csv.reader(buf, dialect="unix")
-                        col_i, col_j = start_pos - 1, start_pos + len(cells) - 1
-                        for row in reader:
-                            state = row[2].upper()
-                            logical_record_number = row[5]
-                            try:
-                                values = [
-                                    int(value)
-                                    if (value and value != "." and int(value) > 0)
-                                    else None
-                                    for value in row[col_i:col_j]
-                                ]
-                            except ValueError:
-                                values = [
-                                    float(value)
-                                    if (value and value != "." and float(value) >= 0)
-                                    else None
-                                    for value in row[col_i:col_j]
-                                ]
-                            key = f"{state}__{logical_record_number}"
-                            table[key] = {
-                                k: v for k, v in zip(cells, values) if v is not None
-                            }
-        table = pd.DataFrame.from_dict(table).transpose()
+        if seq_number is None:
+            raise LookupError(f"{table_title} ({subject_area}) has no sequence number in {self.lookup_path}")
+        data_zips = self.data_zips if state is None else self.state_zips[state]
+        col_i, col_j = start_pos - 1, start_pos + len(cells) - 1
+        table, moe_table = {}, {}
+        for data_zip in data_zips:
+            if self.archive is not None:
+                filenames = self.archive.find(data_zip.filename, "e", seq_number)
+                names = set(self.archive.find(data_zip.filename, "m", seq_number))
+            else:
+                names = set(data_zip.namelist())
+                filenames = [
+                    x
+                    for x in names
+                    if x.startswith("e") and x.endswith("%04d000.txt" % seq_number)
+                ]
+            for filename in sorted(filenames):
+                table.update(self.read_member(data_zip, filename, col_i, col_j, cells))
+                moe_filename = "m" + filename[1:]
+                if moe and (moe_filename in names):
+                    moe_table.update(
+                        self.read_member(data_zip, moe_filename, col_i, col_j, cells)
+                    )
         table_id = (
             self.lookups.query(
                 "(table_title==@table_title) & (subject_area==@subject_area)"
@@ -230,8 +477,24 @@ class ACS:
             .iloc[0]
             .loc["table_id"]
         )
-        table.columns = [x.replace(":", "").strip().replace(" ", "_") for x in table]
-        table.columns = [f"{subject_abbr}__{table_id}__{x}".lower() for x in table]
+        names = {
+            cell: f"{subject_abbr}__{table_id}__{cell.replace(':', '').strip().replace(' ', '_')}".lower()
+            for cell in cells
+        }
+        if columns is not None:
+            # read_member leaves missing cells out of a row, so complete rows have every cell seen in the table
+            present = set().union(*table.values())
+            keep = [cell for cell in cells if (cell in present) and (names[cell] in columns)]
+            table = {k: {cell: row[cell] for cell in keep} for k, row in table.items() if len(row) == len(present)}
+            moe_table = {k: {cell: row[cell] for cell in keep if cell in row} for k, row in moe_table.items()}
+        frames = []
+        for rows in [table, moe_table]:
+            frame = pd.DataFrame.from_dict(rows).transpose()
+            frame.columns = [names[x] for x in frame]
+            frames.append(frame)
+        table, moe_table = frames
+        if self.dtype is not None:
+            table, moe_table = table.astype(self.dtype), moe_table.astype(self.dtype)
         table = (
             table.join(self.geos)
             .set_index(["state_abbr", "logrecno", "geo_label", "geoid"])
@@ -240,67 +503,221 @@ class ACS:
             .dropna()
             .sort_index()
         )
-        return table
-
-    def parse_tables(self):
-        for row in self.lookups.iterrows():
-            table_id, table_title, subject_area, subject_abbr = (
-                row[1].loc["table_id"],
-                row[1].loc["table_title"],
-                row[1].loc["subject_area"],
-                row[1].loc["subject_abbr"],
-            )
-            try:
-                dst = self.interim_data_dir / f"acs__table_{table_id}.pkl"
+        if not moe:
+            return table
+        moe_table = (
+            moe_table.join(self.geos, how="inner")
+            .set_index("geoid")
+            .reindex(index=table.index, columns=table.columns)
+        )
+        return table, moe_table
+
+    def parse_tables(self, states=None, plan=None, moe=False):
+        """Parse each selected table into per-state shards.
+        A shard is re-parsed when its input zips change (see get_shard_fingerprint); other shards are left alone.
+        With a projection `plan` (see get_projection_plan), tables whose columns would all be dropped by
+        preprocess_tables are not parsed at all, and the others keep only their surviving columns.
+        Tables that fail are recorded in a failure manifest and skipped until the shard's zips or the lookups change.
+        If `moe` is True, aligned margin-of-error tables (acs__moe_{table_id}.pkl) are written in the same pass.
+        """
+        self.refreshed_states = []
+        self.failures = self.read_failures()
+        self.skipped_failures = []
+        lookups_fingerprint = self.get_lookups_fingerprint()
+        for state in sorted(states or self.state_zips):
+            state = state.lower()
+            shard_dir = self.get_shard_dir(state)
+            shard_dir.mkdir(parents=True, exist_ok=True)
+            fingerprint = self.get_shard_fingerprint(state)
+            manifest = self.read_shard_manifest(state)
+            stale = manifest.get("fingerprint") != fingerprint
+            if stale or self.overwrite:
+                self.refreshed_states.append(state)
+                manifest["projected"] = {}
+            projected = manifest.setdefault("projected", {})  # table_id -> columns kept by a partial parse
+            for row in self.lookups.iterrows():
+                table_id, table_title, subject_area, subject_abbr = (
+                    row[1].loc["table_id"],
+                    row[1].loc["table_title"],
+                    row[1].loc["subject_area"],
+                    row[1].loc["subject_abbr"],
+                )
+                columns = None if plan is None else plan.get(table_id.lower())
+                if (columns is not None) and (len(columns) == 0):
+                    continue
+                # a partial parse from an earlier plan may lack columns that the current plan keeps
+                missing_columns = (table_id in projected) and (
+                    (columns is None) or (not set(columns) <= set(projected[table_id]))
+                )
+                key = f"{state}__{table_id}"
+                failure_fingerprint = f"{fingerprint}__{lookups_fingerprint}"
+                failure = self.failures.get(key)
+                if (
+                    (failure is not None)
+                    and (failure["fingerprint"] == failure_fingerprint)
+                    and (not self.overwrite)
+                ):
+                    self.skipped_failures.append(failure)
+                    continue
+                dst = shard_dir / f"acs__table_{table_id}.pkl"
+                moe_dst = shard_dir / f"acs__moe_{table_id}.pkl"
+                missing_moe = moe and (not moe_dst.exists())
                 # TODO: Refactor the conditional so that it uses pydoit's dependency management framework
-                if (not dst.exists()) or (self.overwrite):
+                if (not dst.exists()) or stale or missing_columns or missing_moe or (self.overwrite):
                     if self.verbose:
                         print("*", end="")
-                    self.parse_table(table_title, subject_area, subject_abbr).to_pickle(
-                        dst
-                    )
-            except:
-                # TODO: re-write this try except block to handle the specific TypeError that was raised in parse_table method
-                pass
+                    start = time.time()
+                    try:
+                        parsed = self.parse_table(
+                            table_title, subject_area, subject_abbr, state=state, columns=columns, moe=moe
+                        )
+                        if moe:
+                            parsed[0].to_pickle(dst)
+                            parsed[1].to_pickle(moe_dst)
+                        else:
+                            parsed.to_pickle(dst)
+                    except Exception as e:
+                        self.failures[key] = {
+                            "state": state,
+                            "table_id": table_id,
+                            "exception": type(e).__name__,
+                            "message": str(e),
+                            "fingerprint": failure_fingerprint,
+                            "seconds": time.time() - start,
+                        }
+                        continue
+                    self.failures.pop(key, None)
+                    if columns is None:
+                        projected.pop(table_id, None)
+                    else:
+                        projected[table_id] = columns
+            manifest["fingerprint"] = fingerprint
+            self.write_shard_manifest(state, manifest)
+            self.write_failures()
         return True
 
-    def join_tables(self):
-        # TODO: Refactor the conditional so that it uses pydoit's dependency management framework
-        if self.acs_data_dst.exists() and (not self.overwrite):
-            self.acs_data = pd.read_pickle(self.acs_data_dst)
-        else:
-            self.acs_data = (
-                pd.Series(self.geos.geoid.unique(), name="geoid")
-                .to_frame()
-                .set_index("geoid")
-                .sort_index()
-            )
-            for path in self.interim_data_dir.iterdir():
-                if path.stem.startswith("acs__table"):
-                    table = pd.read_pickle(path)
-                    c = [x for x in table if x not in self.acs_data]
-                    if len(c) > 0:
-                        self.acs_data = self.acs_data.join(table[c], how="left")
-            self.acs_data.to_pickle(self.acs_data_dst)
+    def join_shard(self, state, plan=None, kind="table"):
+        """Join a state's parsed tables into one shard frame, unless it is already newer than all of them.
+        With a projection `plan`, tables it drops are left out even if an earlier run parsed them.
+        `kind` is "table" for estimates (acs__tables.pkl) or "moe" for margins of error (acs__moes.pkl).
+        """
+        shard_dir = self.get_shard_dir(state)
+        dst = shard_dir / f"acs__{kind}s.pkl"
+        paths = sorted(shard_dir.glob(f"acs__{kind}_*.pkl"))
+        if plan is not None:
+            paths = [
+                p for p in paths if len(plan.get(p.stem.split("_")[-1].lower(), [None])) > 0
+            ]
+        manifest = self.read_shard_manifest(state)
+        joined = [p.name for p in paths]
+        if (
+            dst.exists()
+            and (not self.overwrite)
+            and manifest.get(f"joined_{kind}s") == joined
+            and all(p.stat().st_mtime <= dst.stat().st_mtime for p in paths)
+        ):
+            return False
+        geos = self.geos.query("state_abbr == @state.upper()")
+        frame = (
+            pd.Series(geos.geoid.unique(), name="geoid")
+            .to_frame()
+            .set_index("geoid")
+            .sort_index()
+        )
+        for path in paths:
+            table = pd.read_pickle(path)
+            c = [x for x in table if x not in frame]
+            if len(c) > 0:
+                if plan is not None:
+                    # tables parsed before the plan existed still carry columns that will be dropped
+                    keep = plan.get(path.stem.split("_")[-1].lower())
+                    c = [x for x in c if (keep is None) or (x in keep) or (x in self.geos)]
+                frame = frame.join(table[c], how="left")
+        frame.to_pickle(dst)
+        manifest[f"joined_{kind}s"] = joined
+        self.write_shard_manifest(state, manifest)
+        return True
 
+    def join_tables(self, states=None, plan=None, moe=False):
+        """Join parsed tables shard by shard; the national frame is only assembled when `acs_data` is accessed"""
+        for state in sorted(states or self.state_zips):
+            if self.join_shard(state.lower(), plan=plan) and state.lower() not in self.refreshed_states:
+                self.refreshed_states.append(state.lower())
+            if moe:
+                self.join_shard(state.lower(), plan=plan, kind="moe")
+        self._acs_data = None
+        self._moe_data = None
         return True
 
-    def preprocess_tables(self, null_thresh=20000, states_only=True):
+    @staticmethod
+    def clean_column(x):
+        return x.replace(",", "").replace("/", "").replace(".", "").replace(":", "")
+
+    @classmethod
+    def clean_tables(cls, frame, states_only=True):
+        """Drop non-state geographies, strip punctuation from column names, and set the geography index"""
+        if states_only:
+            frame = frame.query("state_abbr.notnull()")
+        frame = frame.copy()
+        frame.columns = [cls.clean_column(x) for x in frame]
+        ix = ['geoid', 'state_abbr', 'logrecno', 'geo_label']
+        return frame.reset_index().set_index(ix)
+
+    @staticmethod
+    def coefficient_of_variation(estimates, moes):
+        """Coefficient of variation of each estimate; ACS margins of error are at the 90% confidence level"""
+        return (moes / 1.645) / estimates.where(estimates > 0)
+
+    def preprocess_tables(self, null_thresh=20000, states_only=True, moe=False):
+        """Drop sparse columns and clean the national frame; with `moe`, also write margins of error aligned to it"""
         # TODO: Refactor the conditional so that it uses pydoit's dependency management framework
-        if self.preprocessed_acs_data_dst.exists() and (not self.overwrite):
+        shard_paths = [
+            self.get_shard_dir(state) / "acs__tables.pkl" for state in self.state_zips
+        ]
+        params = {"null_thresh": null_thresh, "states_only": states_only}
+        params_src = self.preprocessed_acs_data_dst.with_suffix(".json")
+        previous_params = json.loads(params_src.read_text()) if params_src.exists() else {}
+        up_to_date = (
+            self.preprocessed_acs_data_dst.exists()
+            and len(self.refreshed_states) == 0
+            and previous_params == params
+            and all(
+                p.stat().st_mtime <= self.preprocessed_acs_data_dst.stat().st_mtime
+                for p in shard_paths
+                if p.exists()
+            )
+        )
+        if up_to_date and (not self.overwrite):
             self.preprocessed_acs_data = pd.read_pickle(self.preprocessed_acs_data_dst)
         else:
-            m = self.acs_data.isnull().sum() < null_thresh
-            self.preprocessed_acs_data = self.acs_data.copy()[m[m].index.values]
-            if states_only:
-                self.preprocessed_acs_data = self.preprocessed_acs_data.query(
-                    "state_abbr.notnull()"
-                )
-            self.preprocessed_acs_data.columns = [
-                x.replace(",", "").replace("/", "").replace(".", "").replace(":", "")
-                for x in self.preprocessed_acs_data
-            ]
-            ix = ['geoid', 'state_abbr', 'logrecno', 'geo_label']
-            self.preprocessed_acs_data = self.preprocessed_acs_data.reset_index().set_index(ix)
+            # count nulls shard by shard and only assemble the surviving columns, rather than the whole national frame
+            null_counts = self.count_shard_nulls()
+            self.write_null_profile(null_counts)
+            m = null_counts < null_thresh
+            self.preprocessed_acs_data = self.clean_tables(
+                self.assemble_shards(
+                    "acs__tables.pkl", columns={self.clean_column(x) for x in m[m].index}
+                ),
+                states_only=states_only,
+            )
             self.preprocessed_acs_data.to_pickle(self.preprocessed_acs_data_dst)
+            params_src.write_text(json.dumps(params))
+        if not moe:
+            return True
+        if up_to_date and self.preprocessed_moe_data_dst.exists() and (not self.overwrite):
+            self.preprocessed_moe_data = pd.read_pickle(self.preprocessed_moe_data_dst)
+        else:
+            # same rows and columns as the preprocessed estimates
+            moe_data = self.assemble_shards(
+                "acs__moes.pkl",
+                columns=set(self.preprocessed_acs_data.columns)
+                | {"geoid", "state_abbr", "logrecno", "geo_label"},
+            )
+            self.preprocessed_moe_data = self.clean_tables(
+                moe_data, states_only=states_only
+            ).reindex(
+                index=self.preprocessed_acs_data.index,
+                columns=self.preprocessed_acs_data.columns,
+            )
+            self.preprocessed_moe_data.to_pickle(self.preprocessed_moe_data_dst)
         return True
@@ -0,0 +1,130 @@
+# standard library imports
+import json
+import os
+from pathlib import Path
+import re
+import shutil
+import zipfile
+
+# third-party imports
+from loguru import logger
+
+# e20185md0001000.txt (estimates), m20185md0001000.txt (margins of error), g20185md.csv (geography)
+MEMBER_PATTERN = re.compile(
+    r"^(?P<kind>[em])\d{5}[a-z]{2}(?P<seq>\d{4})000\.txt$|^(?P<geo>g)\d{5}[a-z]{2}\.csv$"
+)
+
+
+class ArchiveCache:
+    """Catalog of ACS summary file zips plus an extract-once cache of their members.
+    The catalog maps each zip's (kind, sequence) to its member names, so a table's members are found without scanning
+    every zip's `infolist()`; it is rebuilt per zip only when that zip's size or modification time changes.
+    With `extract`, each member is inflated on first read into `cache_dir/<sequence>/<zip stem>/` and read from there
+    on later reads; the zip stem keeps apart members of the same name in a state's two zips (e.g., the tracts and block
+    groups zip and the all-other-geographies zip both ship e20185md0001000.txt).
+    Extracted sequences are evicted least recently used first once they exceed `max_bytes`.
+    """
+
+    def __init__(self, cache_dir, max_bytes, extract=True):
+        self.cache_dir = Path(cache_dir)
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+        self.catalog_dst = self.cache_dir / "catalog.json"
+        self.max_bytes = max_bytes
+        self.extract = extract
+        self.catalog = {}  # zip path -> {"size", "mtime_ns", "members": {"e0001": [...], "m0001": [...], "g": [...]}}
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def get_key(kind, seq_number=None):
+        return kind if seq_number is None else f"{kind}{int(seq_number):04d}"
+
+    def build(self, zip_paths):
+        """Catalog the given zips, reusing the saved entries of zips that have not changed"""
+        saved = {}
+        if self.catalog_dst.exists():
+            with open(self.catalog_dst) as f:
+                saved = json.load(f)
+        self.catalog = {}
+        n_scanned = 0
+        for zip_path in sorted(str(x) for x in zip_paths):
+            stat = os.stat(zip_path)
+            entry = saved.get(zip_path, {})
+            if (entry.get("size") == stat.st_size) and (entry.get("mtime_ns") == stat.st_mtime_ns):
+                self.catalog[zip_path] = entry
+                continue
+            for names in entry.get("members", {}).values():  # drop members extracted from the old zip
+                for name in names:
+                    self.get_extract_path(zip_path, name).unlink(missing_ok=True)
+            members = {}
+            with zipfile.ZipFile(zip_path, "r") as data_zip:
+                for name in data_zip.namelist():
+                    m = MEMBER_PATTERN.match(name)
+                    if m is None:
+                        continue
+                    key = "g" if m.group("geo") else self.get_key(m.group("kind"), m.group("seq"))
+                    members.setdefault(key, []).append(name)
+            self.catalog[zip_path] = {"size": stat.st_size, "mtime_ns": stat.st_mtime_ns, "members": members}
+            n_scanned += 1
+        with open(self.catalog_dst, "w") as f:
+            json.dump(self.catalog, f)
+        logger.debug(f"Archive catalog: scanned {n_scanned} of {len(self.catalog)} zip(s)")
+        return True
+
+    def find(self, zip_path, kind, seq_number=None):
+        """Member names of one kind ("e", "m", or "g") and sequence in a cataloged zip"""
+        return self.catalog[str(zip_path)]["members"].get(self.get_key(kind, seq_number), [])
+
+    def get_states(self, zip_path):
+        """Lowercase state abbreviations whose geography file is in a cataloged zip"""
+        return {Path(x).stem[-2:].lower() for x in self.find(zip_path, "g")}
+
+    def get_extract_path(self, zip_path, member):
+        m = MEMBER_PATTERN.match(member)
+        group = "geo" if (m is None) or m.group("geo") else m.group("seq")
+        return self.cache_dir / group / Path(zip_path).stem / member
+
+    def read(self, data_zip, member):
+        """Return a member's bytes, from the extract cache when possible"""
+        if not self.extract:
+            return data_zip.read(member)
+        path = self.get_extract_path(data_zip.filename, member)
+        group = path.parent.parent
+        if path.exists():
+            self.hits += 1
+            os.utime(group)  # mark the sequence as recently used
+            with open(path, "rb") as f:
+                return f.read()
+        self.misses += 1
+        data = data_zip.read(member)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = path.with_suffix(path.suffix + ".tmp")
+        with open(tmp, "wb") as f:
+            f.write(data)
+        os.replace(tmp, path)  # readers never see a partial member
+        os.utime(group)
+        self.evict(keep=group)
+        return data
+
+    def evict(self, keep=None):
+        """Delete least recently used sequences until the extracted members fit in max_bytes"""
+        groups = [x for x in self.cache_dir.iterdir() if x.is_dir()]
+        sizes = {x: sum(p.stat().st_size for p in x.rglob("*") if p.is_file()) for x in groups}
+        total = sum(sizes.values())
+        for group in sorted(groups, key=lambda x: x.stat().st_mtime):
+            if total <= self.max_bytes:
+                break
+            if group == keep:
+                continue
+            total -= sizes[group]
+            shutil.rmtree(group)
+            logger.debug(f"Archive cache evicted: {group.name}")
+        return True
+
+    def log_stats(self):
+        n = self.hits + self.misses
+        logger.debug(
+            f"Archive cache: {self.hits} hit(s), {self.misses} miss(es)"
+            + (f", hit rate {self.hits / n:.0%}" if n > 0 else "")
+        )
+        return True
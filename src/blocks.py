@@ -0,0 +1,26 @@
+# standard library imports
+from concurrent.futures import ThreadPoolExecutor
+
+# third-party imports
+import numpy as np
+
+
+def map_blocks(func, X: np.array, block_size: int, n_threads=1) -> np.array:
+    """Apply a row-wise `func` (e.g., a fitted model's transform or predict) to `X` one block of rows at a time.
+    Blocks run in a thread pool (numpy and BLAS release the GIL) and write into one preallocated output, so only
+    `n_threads` blocks of temporaries exist at once; the result equals `func(X)`.
+    """
+    X = np.asarray(X)
+    if (block_size is None) or (block_size >= len(X)):
+        return func(X)
+    first = func(X[:block_size])  # fixes the output's dtype and trailing shape
+    out = np.empty((len(X),) + first.shape[1:], dtype=first.dtype)
+    out[:block_size] = first
+
+    def fill(start):
+        out[start : start + block_size] = func(X[start : start + block_size])
+
+    with ThreadPoolExecutor(max_workers=n_threads) as executor:
+        # list() re-raises the first failed block
+        list(executor.map(fill, range(block_size, len(X), block_size)))
+    return out
@@ -0,0 +1,77 @@
+# standard library imports
+import hashlib
+import json
+import os
+from pathlib import Path
+import pickle
+
+# third-party imports
+from loguru import logger
+import numpy as np
+
+
+class FitCache:
+    """Size-bounded, least-recently-used disk cache of fitted models and their scores.
+    Entries are keyed on a fingerprint of the training data plus the model's hyperparameters (including its seed), so a
+    rerun with the same data and parameters loads the fitted model instead of refitting it.
+    """
+
+    def __init__(self, cache_dir, max_bytes):
+        self.cache_dir = Path(cache_dir)
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def fingerprint(X) -> str:
+        """Hash an array's shape, dtype, and contents"""
+        X = np.ascontiguousarray(X)
+        h = hashlib.blake2b(digest_size=16)
+        h.update(f"{X.shape}{X.dtype}".encode())
+        h.update(X.view(np.uint8).reshape(-1))
+        return h.hexdigest()
+
+    @staticmethod
+    def get_key(kind: str, data_fingerprint: str, params: dict) -> str:
+        """Key on the data and the hyperparameters; verbosity settings do not change the fit"""
+        params = {k: v for k, v in params.items() if not k.startswith("verbose")}
+        di = {"kind": kind, "data": data_fingerprint, "params": params}
+        return hashlib.md5(json.dumps(di, sort_keys=True, default=str).encode()).hexdigest()
+
+    def get_or_fit(self, kind: str, data_fingerprint: str, params: dict, fit):
+        """Load the cached result of `fit()` for this data and these parameters, or call `fit()` and cache it"""
+        path = self.cache_dir / f"{kind}__{self.get_key(kind, data_fingerprint, params)}.pkl"
+        if path.exists():
+            with open(path, "rb") as f:
+                obj = pickle.load(f)
+            os.utime(path)  # mark as recently used
+            self.hits += 1
+            logger.debug(f"Fit cache hit: {path.name}")
+            return obj
+        self.misses += 1
+        obj = fit()
+        with open(path, "wb") as f:
+            pickle.dump(obj, f)
+        self.evict()
+        return obj
+
+    def evict(self):
+        """Delete least recently used entries until the cache fits in max_bytes"""
+        paths = sorted(self.cache_dir.glob("*.pkl"), key=lambda p: p.stat().st_mtime)
+        total = sum(p.stat().st_size for p in paths)
+        for path in paths:
+            if total <= self.max_bytes:
+                break
+            total -= path.stat().st_size
+            path.unlink()
+            logger.debug(f"Fit cache evicted: {path.name}")
+        return True
+
+    def log_stats(self):
+        n = self.hits + self.misses
+        logger.debug(
+            f"Fit cache: {self.hits} hit(s), {self.misses} miss(es)"
+            + (f", hit rate {self.hits / n:.0%}" if n > 0 else "")
+        )
+        return True
@@ -0,0 +1,38 @@
+# standard library imports
+from concurrent.futures import ThreadPoolExecutor
+import time
+
+# third-party imports
+from loguru import logger
+
+
+class AsyncCheckpointer:
+    """Write pipeline outputs on a background thread while later stages keep computing.
+    Only checkpoints named in `names` are written, unless a save is marked `required` (e.g., final outputs). Objects
+    handed to `save` must not be modified afterwards; every stage returns new objects rather than editing its inputs.
+    """
+
+    def __init__(self, names=(), max_workers=1):
+        self.names = set(names)
+        self.executor = ThreadPoolExecutor(max_workers=max_workers)
+        self.futures = {}
+
+    def timed(self, name, write, args):
+        start = time.time()
+        write(*args)
+        seconds = time.time() - start
+        logger.debug(f"Wrote checkpoint {name} in {seconds:.1f}s")
+        return seconds
+
+    def save(self, name, write, *args, required=False):
+        """Queue `write(*args)` if `name` was requested; returns whether it was queued"""
+        if (not required) and (name not in self.names):
+            return False
+        self.futures[name] = self.executor.submit(self.timed, name, write, args)
+        return True
+
+    def wait(self):
+        """Block until every queued write finishes, re-raising the first failure"""
+        seconds = {name: future.result() for name, future in self.futures.items()}
+        self.executor.shutdown()
+        return seconds
@@ -0,0 +1,106 @@
+# standard library imports
+from pathlib import Path
+
+# third-party imports
+import numpy as np
+import pandas as pd
+
+
+class ProfileCube:
+    """Per-cluster, per-state summary statistics for every feature, stored as one dense float32 array.
+    Axes are (stat, cluster, state, feature); state "US" holds the national statistics of each cluster.
+    """
+
+    def __init__(self, values, stats, clusters, states, features):
+        self.values = values
+        self.stats = list(stats)
+        self.clusters = list(clusters)
+        self.states = list(states)
+        self.features = list(features)
+
+    @classmethod
+    def build(cls, frame, weight_col=None, quantiles=(0.1, 0.25, 0.75, 0.9)):
+        """Compute the cube from labeled tract data indexed by (at least) `cluster` and `state_abbr`"""
+        values = frame.reset_index(drop=True).astype(np.float32)
+        clusters = frame.index.get_level_values("cluster").values
+        states = frame.index.get_level_values("state_abbr").values
+        weights = None if weight_col is None else values[weight_col]
+        frames = {}
+        for level, keys in [("state", [clusters, states]), ("US", [clusters])]:
+            grouped = values.groupby(keys)
+            stats = {
+                "count": grouped.count(),
+                "mean": grouped.mean(),
+                "median": grouped.median(),
+            }
+            q = grouped.quantile(list(quantiles))
+            for quantile in quantiles:
+                stats[f"q{int(quantile * 100)}"] = q.xs(quantile, level=-1)
+            if weights is not None:
+                num = values.mul(weights, axis=0).groupby(keys).sum()
+                den = values.notnull().mul(weights, axis=0).groupby(keys).sum()
+                stats["weighted_mean"] = num / den.replace(0, np.nan)
+            if level == "US":
+                stats = {
+                    k: v.set_index(pd.MultiIndex.from_product([v.index, ["US"]]))
+                    for k, v in stats.items()
+                }
+            frames[level] = stats
+
+        stat_names = list(frames["US"])
+        cluster_ix = sorted(set(clusters))
+        state_ix = sorted(set(states)) + ["US"]
+        full_ix = pd.MultiIndex.from_product([cluster_ix, state_ix])
+        cube = np.full(
+            (len(stat_names), len(cluster_ix), len(state_ix), values.shape[1]),
+            np.nan,
+            dtype=np.float32,
+        )
+        for i, stat in enumerate(stat_names):
+            stacked = pd.concat([frames["state"][stat], frames["US"][stat]])
+            cube[i] = (
+                stacked.reindex(full_ix)
+                .values.reshape(len(cluster_ix), len(state_ix), -1)
+                .astype(np.float32)
+            )
+        return cls(cube, stat_names, cluster_ix, state_ix, values.columns)
+
+    def save(self, dst):
+        np.savez_compressed(
+            dst,
+            values=self.values,
+            stats=np.array(self.stats),
+            clusters=np.array(self.clusters),
+            states=np.array(self.states),
+            features=np.array(self.features),
+        )
+        return True
+
+    @classmethod
+    def load(cls, src):
+        with np.load(Path(src)) as f:
+            return cls(f["values"], f["stats"], f["clusters"], f["states"], f["features"])
+
+    def get(self, stat, state="US", clusters=None, features=None) -> pd.DataFrame:
+        """Get a cluster x feature frame of one statistic for one state (or "US")"""
+        clusters = self.clusters if clusters is None else list(clusters)
+        features = self.features if features is None else list(features)
+        i = self.stats.index(stat)
+        j = [self.clusters.index(x) for x in clusters]
+        k = self.states.index(state)
+        feature_ix = pd.Index(self.features).get_indexer(features)
+        return pd.DataFrame(
+            self.values[i][np.ix_(j, [k], feature_ix)][:, 0, :],
+            index=pd.Index(clusters, name="cluster"),
+            columns=features,
+        )
+
+    def get_feature(self, stat, feature) -> pd.DataFrame:
+        """Get a cluster x state frame of one statistic for one feature"""
+        i = self.stats.index(stat)
+        k = self.features.index(feature)
+        return pd.DataFrame(
+            self.values[i][:, :, k],
+            index=pd.Index(self.clusters, name="cluster"),
+            columns=pd.Index(self.states, name="state_abbr"),
+        )
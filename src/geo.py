@@ -0,0 +1,160 @@
+# standard library imports
+from pathlib import Path
+
+# third-party imports
+import geopandas as gpd
+import numpy as np
+import pandas as pd
+from rtree import index
+from scipy import sparse
+from shapely.geometry import Point, box
+
+
+class TractStore:
+    """Geoid-indexed tract geometries with a persisted R-tree spatial index.
+    Built once from the TIGER tract shapefiles by `build`; each simplification level is a separate pickle so that maps
+    can load a light layer while spatial queries use the full-resolution one.
+    """
+
+    def __init__(self, store_dir, level="full"):
+        self.store_dir = Path(store_dir)
+        self.level = level
+        self.tracts = pd.read_pickle(self.get_level_path(self.store_dir, level))
+        # R-tree ids are row positions in the full-resolution layer, which shares its row order with every level
+        self.rtree = index.Index(str(self.store_dir / "rtree"))
+
+    @staticmethod
+    def get_level_path(store_dir, level):
+        return Path(store_dir) / f"tracts__{level}.pkl"
+
+    @classmethod
+    def build(cls, shapefile_srcs, store_dir, crs, tolerances=(), verbose=False):
+        """Convert TIGER tract shapefile zips into one geoid-indexed store plus simplified levels and an R-tree"""
+        store_dir = Path(store_dir)
+        store_dir.mkdir(parents=True, exist_ok=True)
+        frames = []
+        for src in shapefile_srcs:
+            if verbose:
+                print("Reading", src)
+            gdf = gpd.read_file(f"zip://{src}")
+            gdf.columns = [x.lower() for x in gdf]
+            frames.append(gdf[["geoid", "aland", "awater", "geometry"]].to_crs(crs))
+        tracts = gpd.GeoDataFrame(pd.concat(frames, ignore_index=True), crs=crs)
+        tracts = tracts.drop_duplicates("geoid").set_index("geoid").sort_index()
+        tracts.to_pickle(cls.get_level_path(store_dir, "full"))
+        for tolerance in tolerances:
+            simplified = tracts.copy()
+            simplified["geometry"] = simplified.geometry.simplify(
+                tolerance, preserve_topology=True
+            )
+            simplified.to_pickle(cls.get_level_path(store_dir, tolerance))
+
+        # bulk-load the R-tree from a stream, which is much faster than inserting one tract at a time
+        for suffix in [".dat", ".idx"]:
+            (store_dir / f"rtree{suffix}").unlink(missing_ok=True)
+        stream = (
+            (i, bounds, None) for i, bounds in enumerate(tracts.geometry.bounds.values)
+        )
+        rtree = index.Index(str(store_dir / "rtree"), stream)
+        rtree.close()
+        return True
+
+    def lookup(self, geoids):
+        """Get tract(s) by geoid; the index is unique and hashed, so this is constant time per geoid"""
+        return self.tracts.loc[geoids]
+
+    def query_bbox(self, minx, miny, maxx, maxy, exact=True):
+        """Get tracts that intersect a bounding box"""
+        ix = sorted(self.rtree.intersection((minx, miny, maxx, maxy)))
+        candidates = self.tracts.iloc[ix]
+        if exact:
+            candidates = candidates[candidates.intersects(box(minx, miny, maxx, maxy))]
+        return candidates
+
+    def query_point(self, x, y):
+        """Get the geoid of the tract that contains a point, or None"""
+        point = Point(x, y)
+        for i in self.rtree.intersection((x, y, x, y)):
+            if self.tracts.geometry.iat[i].contains(point):
+                return self.tracts.index[i]
+        return None
+
+
+def get_rings(geometry):
+    """Yield the exterior and interior rings of a Polygon or MultiPolygon"""
+    polygons = geometry.geoms if geometry.geom_type == "MultiPolygon" else [geometry]
+    for polygon in polygons:
+        yield polygon.exterior
+        yield from polygon.interiors
+
+
+def build_adjacency(tracts: gpd.GeoDataFrame, contiguity="queen", precision=7):
+    """Build a sparse tract contiguity matrix.
+    TIGER tracts are topologically integrated, so neighbors share identical boundary vertices. Rather than testing
+    polygon pairs, hash every (rounded) vertex and connect tracts through a sparse tract-by-vertex incidence matrix:
+    queen neighbors share a vertex, rook neighbors share an edge (a pair of consecutive vertices).
+    """
+    if contiguity not in ["queen", "rook"]:
+        raise ValueError("contiguity must be either 'queen' or 'rook'")
+    coords, owners, lengths = [], [], []
+    for i, geometry in enumerate(tracts.geometry.values):
+        if geometry is None:
+            continue
+        for ring in get_rings(geometry):
+            xy = np.asarray(ring.coords)[:, :2]
+            coords.append(xy)
+            owners.append(np.full(len(xy), i))
+            lengths.append(len(xy))
+    coords = np.round(np.concatenate(coords) * 10 ** precision).astype(np.int64)
+    owners = np.concatenate(owners)
+    # pack rounded lon / lat into one 64-bit key so that vertices can be hashed with a 1-d unique
+    keys = ((coords[:, 0] + 2 ** 31) << 32) | (coords[:, 1] + 2 ** 31)
+    _, vertex_ids = np.unique(keys, return_inverse=True)
+    if contiguity == "queen":
+        items, item_owners = vertex_ids, owners
+    else:
+        # each ring is closed, so the edges are (v[k], v[k + 1]) for every vertex but the last of its ring
+        not_last = np.ones(len(vertex_ids), dtype=bool)
+        not_last[np.cumsum(lengths) - 1] = False
+        a, b = vertex_ids[not_last], vertex_ids[np.flatnonzero(not_last) + 1]
+        n_vertices = np.int64(vertex_ids.max() + 1)
+        edge_keys = np.minimum(a, b) * n_vertices + np.maximum(a, b)
+        _, items = np.unique(edge_keys, return_inverse=True)
+        item_owners = owners[not_last]
+    incidence = sparse.csr_matrix(
+        (np.ones(len(items), dtype=np.float32), (item_owners, items)),
+        shape=(len(tracts), items.max() + 1),
+    )
+    incidence.data[:] = 1
+    adjacency = (incidence @ incidence.T).tocsr()
+    adjacency.setdiag(0)
+    adjacency.eliminate_zeros()
+    adjacency.data[:] = 1
+    return adjacency
+
+
+def align_adjacency(adjacency, geoids, target_geoids):
+    """Reorder a contiguity matrix built over `geoids` to `target_geoids`; unknown tracts get no neighbors"""
+    pos = pd.Index(geoids).get_indexer(target_geoids)
+    valid = np.flatnonzero(pos >= 0)
+    sub = adjacency[pos[valid]][:, pos[valid]].tocoo()
+    return sparse.csr_matrix(
+        (sub.data, (valid[sub.row], valid[sub.col])),
+        shape=(len(target_geoids), len(target_geoids)),
+    )
+
+
+def smooth_posteriors(proba: np.array, adjacency, alpha=0.5, n_iter=3) -> np.array:
+    """Blend each tract's cluster posteriors with the mean posteriors of its neighbors.
+    Each iteration computes (1 - alpha) * proba + alpha * W @ smoothed, where W is the row-normalized contiguity
+    matrix; tracts without neighbors (e.g., islands) keep their own posteriors.
+    """
+    degree = np.asarray(adjacency.sum(axis=1)).ravel()
+    w = sparse.diags(1 / np.maximum(degree, 1)) @ adjacency
+    has_neighbors = (degree > 0)[:, None]
+    smoothed = proba
+    for _ in range(n_iter):
+        smoothed = np.where(
+            has_neighbors, (1 - alpha) * proba + alpha * (w @ smoothed), proba
+        )
+    return smoothed
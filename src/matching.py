@@ -0,0 +1,25 @@
+# third-party imports
+import numpy as np
+from scipy.optimize import linear_sum_assignment
+
+
+def make_contingency(reference: np.array, labels: np.array, n_reference: int, n_labels: int) -> np.array:
+    """Count tracts for each (label, reference label) pair"""
+    return np.bincount(
+        labels * n_reference + reference, minlength=n_labels * n_reference
+    ).reshape(n_labels, n_reference)
+
+
+def match_labels(reference: np.array, labels: np.array, n_reference: int, n_labels=None) -> np.array:
+    """Map labels to reference labels with a Hungarian (maximum-overlap) matching.
+    Returns an array `mapping` such that mapping[labels] is aligned with `reference`; labels left unmatched (when
+    there are more labels than reference labels) get new ids starting at n_reference.
+    """
+    n_labels = n_reference if n_labels is None else n_labels
+    contingency = make_contingency(reference, labels, n_reference, n_labels)
+    rows, cols = linear_sum_assignment(-contingency)
+    mapping = np.full(n_labels, -1)
+    mapping[rows] = cols
+    unmatched = np.flatnonzero(mapping < 0)
+    mapping[unmatched] = n_reference + np.arange(len(unmatched))
+    return mapping
@@ -0,0 +1,16 @@
+# third-party imports
+import linearcorex as lc
+import numpy as np
+
+
+def fit_corex_model(params: dict, X: np.array, cache=None):
+    """Fit Linear Corex with `params`, loading an identical earlier fit from `cache` (a FitCache) if one is given"""
+
+    def fit():
+        ce_model = lc.Corex(verbose=True, **params)
+        ce_model.fit(X)
+        return ce_model
+
+    if cache is None:
+        return fit()
+    return cache.get_or_fit("corex", cache.fingerprint(X), params, fit)
@@ -0,0 +1,103 @@
+# standard library imports
+from pathlib import Path
+import pickle
+
+# third-party imports
+import numpy as np
+import pandas as pd
+from scipy.spatial import cKDTree
+
+# cKDTree.query's parallelism argument is `n_jobs` before scipy 1.6 (as pinned in environment.yml), `workers` after
+try:
+    cKDTree(np.zeros((1, 1))).query(np.zeros((1, 1)), workers=1)
+    QUERY_JOBS_ARG = "workers"
+except TypeError:
+    QUERY_JOBS_ARG = "n_jobs"
+
+
+class SimilarTracts:
+    """Nearest-neighbour index over tracts' Corex latent vectors.
+    Queries restricted to a state and / or cluster use a smaller tree that is built on first use and then kept.
+    `eps` > 0 makes queries approximate: returned neighbours are within (1 + eps) of the true k-th distance.
+    """
+
+    def __init__(self, X, geoids, states, clusters, leaf_size=16):
+        self.X = np.ascontiguousarray(X, dtype=np.float64)
+        self.geoids = pd.Index(geoids)
+        self.states = np.asarray(states)
+        self.clusters = np.asarray(clusters)
+        self.leaf_size = leaf_size
+        self.tree = cKDTree(self.X, leafsize=leaf_size)
+        self._subsets = {}
+
+    def save(self, dst):
+        subsets, self._subsets = self._subsets, {}
+        with open(str(dst), "wb") as f:
+            pickle.dump(self, f)
+        self._subsets = subsets
+        return True
+
+    @staticmethod
+    def load(src):
+        with open(str(Path(src)), "rb") as f:
+            return pickle.load(f)
+
+    def get_subset(self, state=None, cluster=None):
+        """Get (positions, tree) of the tracts in a state and / or cluster"""
+        if (state is None) and (cluster is None):
+            return None, self.tree
+        key = (state, cluster)
+        if key not in self._subsets:
+            m = np.ones(len(self.X), dtype=bool)
+            if state is not None:
+                m &= self.states == state
+            if cluster is not None:
+                m &= self.clusters == cluster
+            positions = np.flatnonzero(m)
+            self._subsets[key] = (positions, cKDTree(self.X[positions], leafsize=self.leaf_size))
+        return self._subsets[key]
+
+    def kneighbors(self, vectors, k=10, state=None, cluster=None, eps=0, workers=1):
+        """Get (distances, positions) of the k nearest tracts to each latent vector, as 2-d arrays"""
+        vectors = np.atleast_2d(vectors)
+        positions, tree = self.get_subset(state, cluster)
+        k = min(k, tree.n)
+        distances, ix = tree.query(vectors, k=k, eps=eps, **{QUERY_JOBS_ARG: workers})
+        distances, ix = distances.reshape(len(vectors), k), ix.reshape(len(vectors), k)
+        if positions is not None:
+            ix = positions[ix]
+        return distances, ix
+
+    def query(self, geoids=None, vectors=None, k=10, state=None, cluster=None, eps=0, workers=1):
+        """Get the k most similar tracts to each geoid (excluding itself) or latent vector.
+        Accepts a batch of geoids or a 2-d array of vectors; returns one row per (query, rank).
+        Raises KeyError if any geoid is not in the index.
+        """
+        if (geoids is None) == (vectors is None):
+            raise ValueError("Provide either geoids or vectors")
+        if geoids is not None:
+            geoids = [geoids] if isinstance(geoids, str) else list(geoids)
+            positions = self.geoids.get_indexer(geoids)
+            if (positions < 0).any():
+                missing = [x for x, i in zip(geoids, positions) if i < 0]
+                raise KeyError(f"Geoid(s) not in the index: {missing}")
+            vectors = self.X[positions]
+            queries = geoids
+        else:
+            vectors = np.atleast_2d(vectors)
+            queries = list(range(len(vectors)))
+        n = k + 1 if geoids is not None else k
+        distances, ix = self.kneighbors(vectors, n, state, cluster, eps, workers)
+        out = pd.DataFrame(
+            {
+                "query": np.repeat(queries, ix.shape[1]),
+                "geoid": self.geoids.values[ix.ravel()],
+                "distance": distances.ravel(),
+                "state_abbr": self.states[ix.ravel()],
+                "cluster": self.clusters[ix.ravel()],
+            }
+        )
+        if geoids is not None:
+            out = out[out["query"] != out["geoid"]]
+        out["rank"] = out.groupby("query").cumcount() + 1
+        return out[out["rank"] <= k].set_index(["query", "rank"])
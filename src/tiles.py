@@ -0,0 +1,204 @@
+# standard library imports
+import hashlib
+import json
+import math
+from pathlib import Path
+
+# third-party imports
+from loguru import logger
+import numpy as np
+import pandas as pd
+
+TILE_SIZE = 256  # pixels
+
+
+def get_pixel_degrees(zoom):
+    """Approximate width of one pixel, in degrees of longitude, at a zoom level"""
+    return 360 / (TILE_SIZE * 2 ** zoom)
+
+
+def get_tile_xy(lon, lat, zoom):
+    """Web Mercator (slippy map) tile indices of lon / lat arrays"""
+    n = 2 ** zoom
+    lat = np.radians(np.clip(lat, -85.0511, 85.0511))
+    x = np.floor((np.asarray(lon) + 180) / 360 * n)
+    y = np.floor((1 - np.log(np.tan(lat) + 1 / np.cos(lat)) / math.pi) / 2 * n)
+    return np.clip(x, 0, n - 1).astype(int), np.clip(y, 0, n - 1).astype(int)
+
+
+def get_geometry_level(zoom, levels):
+    """Pick the coarsest simplification level whose tolerance is below a pixel at this zoom ("full" otherwise)"""
+    pixel = get_pixel_degrees(zoom)
+    tolerances = [x for x in levels if (x != "full") and (x <= pixel)]
+    return max(tolerances) if tolerances else "full"
+
+
+def quantize(geometry, decimals):
+    """GeoJSON geometry dict with coordinates rounded to `decimals`"""
+    polygons = geometry.geoms if geometry.geom_type == "MultiPolygon" else [geometry]
+    coordinates = [
+        [np.round(np.asarray(ring.coords)[:, :2], decimals).tolist() for ring in [x.exterior, *x.interiors]]
+        for x in polygons
+    ]
+    if len(coordinates) == 1:
+        return {"type": "Polygon", "coordinates": coordinates[0]}
+    return {"type": "MultiPolygon", "coordinates": coordinates}
+
+
+class TilePyramid:
+    """Zoom-level pyramid of simplified, quantized tract GeoJSON tiles, at `tiles_dir/{z}/{x}/{y}.geojson`.
+    Each tile holds every tract whose bounding box touches it, drawn from the simplification level that fits the zoom,
+    with coordinates rounded to about a tenth of a pixel. A manifest keeps a hash of each tile's geoids and labels, so a
+    rebuild only rewrites tiles whose contents changed (and all of them when the geometry store changes).
+    """
+
+    def __init__(self, tiles_dir, zooms):
+        self.tiles_dir = Path(tiles_dir)
+        self.zooms = list(zooms)
+        self.manifest_dst = self.tiles_dir / "manifest.json"
+        self.n_written = 0
+        self.n_deleted = 0
+
+    def read_manifest(self):
+        if not self.manifest_dst.exists():
+            return {"geometry": None, "tiles": {}}
+        with open(self.manifest_dst) as f:
+            return json.load(f)
+
+    def get_tile_members(self, tracts, zoom):
+        """Map "z/x/y" to the row positions of the tracts whose polygons' bounding boxes touch that tile.
+        Bounding boxes are taken per polygon part, so a tract split at the antimeridian (e.g., in the Aleutians) only
+        touches the tiles at either edge of the map rather than every tile in between.
+        """
+        rows, bounds = [], []
+        for i, geometry in enumerate(tracts.geometry.values):
+            if (geometry is None) or geometry.is_empty:
+                continue
+            for part in geometry.geoms if geometry.geom_type == "MultiPolygon" else [geometry]:
+                rows.append(i)
+                bounds.append(part.bounds)
+        bounds = np.asarray(bounds, dtype=float).reshape(-1, 4)
+        x0, y0 = get_tile_xy(bounds[:, 0], bounds[:, 3], zoom)
+        x1, y1 = get_tile_xy(bounds[:, 2], bounds[:, 1], zoom)
+        members = {}
+        for j, i in enumerate(rows):
+            for x in range(x0[j], x1[j] + 1):
+                for y in range(y0[j], y1[j] + 1):
+                    members.setdefault(f"{zoom}/{x}/{y}", set()).add(i)
+        return {tile: sorted(positions) for tile, positions in members.items()}
+
+    def build(self, tracts_by_level, labels: pd.Series, geometry_fingerprint):
+        """Write the tiles whose tracts or labels changed since the last build and delete tiles that are now empty.
+        `tracts_by_level` maps each simplification level to a geoid-indexed GeoDataFrame with the same rows;
+        `labels` maps geoid to cluster.
+        """
+        manifest = self.read_manifest()
+        rebuild_all = manifest["geometry"] != geometry_fingerprint
+        old_hashes = {} if rebuild_all else manifest["tiles"]
+        new_hashes = {}
+        for zoom in self.zooms:
+            level = get_geometry_level(zoom, list(tracts_by_level))
+            tracts = tracts_by_level[level]
+            tract_labels = labels.reindex(tracts.index)
+            in_labels = tract_labels.notnull().values
+            tracts, tract_labels = tracts[in_labels], tract_labels[in_labels].astype(int)
+            decimals = int(math.ceil(-math.log10(get_pixel_degrees(zoom) / 10)))
+            features = {}  # each tract is quantized once per zoom, however many tiles it touches
+            for tile, positions in self.get_tile_members(tracts, zoom).items():
+                h = hashlib.md5(f"{level}".encode())
+                h.update(tracts.index.values[positions].astype(str).astype("U").tobytes())
+                h.update(tract_labels.values[positions].astype(np.int64).tobytes())
+                new_hashes[tile] = h.hexdigest()
+                if old_hashes.get(tile) == new_hashes[tile]:
+                    continue
+                for i in positions:
+                    if i not in features:
+                        features[i] = {
+                            "type": "Feature",
+                            "geometry": quantize(tracts.geometry.iat[i], decimals),
+                            "properties": {"geoid": tracts.index[i], "cluster": int(tract_labels.iat[i])},
+                        }
+                dst = self.tiles_dir / f"{tile}.geojson"
+                dst.parent.mkdir(parents=True, exist_ok=True)
+                with open(dst, "w") as f:
+                    json.dump({"type": "FeatureCollection", "features": [features[i] for i in positions]}, f)
+                self.n_written += 1
+        for tile in set(manifest["tiles"]) - set(new_hashes):
+            (self.tiles_dir / f"{tile}.geojson").unlink(missing_ok=True)
+            self.n_deleted += 1
+        with open(self.manifest_dst, "w") as f:
+            json.dump({"geometry": geometry_fingerprint, "tiles": new_hashes}, f)
+        logger.debug(
+            f"Tile pyramid: wrote {self.n_written}, kept {len(new_hashes) - self.n_written}, "
+            f"deleted {self.n_deleted} tile(s)"
+        )
+        return True
+
+    def write_index(self, n_clusters):
+        """Write a static Leaflet page that draws the tiles on canvases; serve tiles_dir with any static file server"""
+        html = INDEX_TEMPLATE.replace("__MIN_ZOOM__", str(min(self.zooms)))
+        html = html.replace("__MAX_ZOOM__", str(max(self.zooms)))
+        html = html.replace("__N_CLUSTERS__", str(n_clusters))
+        with open(self.tiles_dir / "index.html", "w") as f:
+            f.write(html)
+        return True
+
+
+INDEX_TEMPLATE = """<!DOCTYPE html>
+<html>
+<head>
+  <meta charset="utf-8">
+  <title>Geoclusterizer clusters</title>
+  <link rel="stylesheet" href="https://unpkg.com/leaflet@1.7.1/dist/leaflet.css">
+  <script src="https://unpkg.com/leaflet@1.7.1/dist/leaflet.js"></script>
+  <style>html, body, #map { height: 100%; margin: 0; }</style>
+</head>
+<body>
+<div id="map"></div>
+<script>
+  const map = L.map("map", {minZoom: __MIN_ZOOM__}).setView([38, -96], __MIN_ZOOM__);
+  L.tileLayer("https://{s}.tile.openstreetmap.org/{z}/{x}/{y}.png", {
+    attribution: "&copy; OpenStreetMap contributors", opacity: 0.5
+  }).addTo(map);
+  const color = (cluster) => `hsl(${Math.round(cluster * 360 / __N_CLUSTERS__)}, 70%, 50%)`;
+  const ClusterLayer = L.GridLayer.extend({
+    createTile: function (coords, done) {
+      const tile = document.createElement("canvas");
+      const size = this.getTileSize();
+      tile.width = size.x;
+      tile.height = size.y;
+      fetch(`${coords.z}/${coords.x}/${coords.y}.geojson`)
+        .then((r) => (r.ok ? r.json() : {features: []}))
+        .then((data) => {
+          const ctx = tile.getContext("2d");
+          const origin = coords.scaleBy(size);
+          ctx.globalAlpha = 0.6;
+          ctx.strokeStyle = "white";
+          ctx.lineWidth = 0.5;
+          for (const feature of data.features) {
+            const geometry = feature.geometry;
+            const polygons = geometry.type === "Polygon" ? [geometry.coordinates] : geometry.coordinates;
+            ctx.beginPath();
+            for (const rings of polygons) {
+              for (const ring of rings) {
+                ring.forEach(([lon, lat], i) => {
+                  const p = map.project([lat, lon], coords.z).subtract(origin);
+                  i ? ctx.lineTo(p.x, p.y) : ctx.moveTo(p.x, p.y);
+                });
+              }
+            }
+            ctx.fillStyle = color(feature.properties.cluster);
+            ctx.fill("evenodd");
+            ctx.stroke();
+          }
+          done(null, tile);
+        })
+        .catch((error) => done(error, tile));
+      return tile;
+    },
+  });
+  new ClusterLayer({minNativeZoom: __MIN_ZOOM__, maxNativeZoom: __MAX_ZOOM__}).addTo(map);
+</script>
+</body>
+</html>
+"""
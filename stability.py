@@ -0,0 +1,187 @@
+# standard library imports
+import argparse
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+import pickle
+import tempfile
+import time
+
+# third-party imports
+from loguru import logger
+import numpy as np
+import pandas as pd
+from sklearn.mixture import GaussianMixture
+
+# local imports
+from settings import (
+    MODEL_DATA_NAME,
+    MODELS_DIR,
+    N_JOBS,
+    N_RESAMPLES,
+    N_THREADS,
+    PROCESSED_DIR,
+    RANDOM_STATE,
+    TRANSFORM_BLOCK_SIZE,
+)
+from src.blocks import map_blocks
+from src.matching import match_labels
+
+
+def fit_resample(x_src: str, params: dict, seed: int) -> tuple:
+    """Refit a Gaussian Mixture model on a bootstrap resample and label every tract.
+    Runs in a worker process; the latent matrix is memory-mapped read-only rather than copied to each worker.
+    """
+    start = time.time()
+    X = np.load(x_src, mmap_mode="r")
+    rng = np.random.RandomState(seed)
+    ix = np.sort(rng.randint(0, len(X), len(X)))
+    gm = GaussianMixture(**{**params, "random_state": seed, "warm_start": False})
+    gm.fit(X[ix])
+    labels = gm.predict(X).astype(np.int16)
+    return labels, time.time() - start
+
+
+def summarize_stability(reference: np.array, resampled_labels: list, n_components: int) -> tuple:
+    """Align each resample's labels to the reference and score agreement per tract and per cluster"""
+    agreement = np.empty((len(reference), len(resampled_labels)), dtype=bool)
+    for i, labels in enumerate(resampled_labels):
+        mapping = match_labels(reference, labels.astype(np.int64), n_components)
+        agreement[:, i] = mapping[labels] == reference
+    tract_stability = agreement.mean(axis=1)
+    counts = np.bincount(reference, minlength=n_components)
+    cluster_stability = np.bincount(
+        reference, weights=tract_stability, minlength=n_components
+    ) / np.maximum(counts, 1)
+    return tract_stability, cluster_stability
+
+
+if __name__ == "__main__":
+    """Estimate how stable the selected Gaussian Mixture clusters are under bootstrap resampling"""
+    # @@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@
+    print("Configure and instantiate logger")
+    logger.add(
+        f"log_{__file__}.log".replace(".py", ""), backtrace=False, diagnose=False
+    )
+    logger.debug(f"Begin {__file__}")
+
+    # @@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@
+    print("Parse arguments")
+    try:
+        description = "Evaluate cluster stability with bootstrap refits"
+        parser = argparse.ArgumentParser(description=description)
+        parser.add_argument(
+            "-j",
+            "--n_jobs",
+            default=N_JOBS,
+            help="Number of worker processes",
+            type=int,
+        )
+        parser.add_argument(
+            "-m",
+            "--models_dir",
+            default=MODELS_DIR,
+            help="Path to models directory",
+            type=Path,
+        )
+        parser.add_argument(
+            "-n",
+            "--n_resamples",
+            default=N_RESAMPLES,
+            help="Number of bootstrap resamples",
+            type=int,
+        )
+        parser.add_argument(
+            "-p",
+            "--processed_dir",
+            default=PROCESSED_DIR,
+            help="Path to processed data directory",
+            type=Path,
+        )
+        parser.add_argument(
+            "-r",
+            "--random_state",
+            default=RANDOM_STATE,
+            help="Seed of the first resample; resample i uses random_state + i",
+            type=int,
+        )
+        args = parser.parse_args()
+        src = args.processed_dir / MODEL_DATA_NAME
+        ce_src = args.models_dir / "corex.pkl"
+        gm_src = args.models_dir / "gaussian_mixture.pkl"
+        tracts_dst = args.processed_dir / "stability_tracts.pkl"
+        clusters_dst = args.processed_dir / "stability_clusters.csv"
+        logger.debug("Finish parsing arguments")
+    except Exception:
+        logger.error("Failed to parse arguments", exc_info=True)
+        raise
+
+    # @@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@
+    print("Load data and models")
+    try:
+        df = pd.read_pickle(src)
+        with open(str(ce_src), "rb") as f:
+            ce_model = pickle.load(f)
+        with open(str(gm_src), "rb") as f:
+            gm_model = pickle.load(f)
+        X = np.ascontiguousarray(map_blocks(ce_model.transform, df.values, TRANSFORM_BLOCK_SIZE, N_THREADS))
+        reference = map_blocks(gm_model.predict, X, TRANSFORM_BLOCK_SIZE, N_THREADS)
+        logger.debug("Finished loading data and models")
+    except Exception:
+        logger.error("Failed to load data and models", exc_info=True)
+        raise
+
+    # @@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@
+    print(f"Refit Gaussian Mixture model on {args.n_resamples} bootstrap resamples")
+    try:
+        start = time.time()
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            x_src = str(Path(tmp_dir) / "X.npy")
+            np.save(x_src, X)
+            params = gm_model.get_params()
+            seeds = [args.random_state + i for i in range(args.n_resamples)]
+            with ProcessPoolExecutor(max_workers=args.n_jobs) as executor:
+                results = list(
+                    executor.map(fit_resample, [x_src] * len(seeds), [params] * len(seeds), seeds)
+                )
+        resampled_labels = [labels for labels, _ in results]
+        seconds = np.array([seconds for _, seconds in results])
+        wall_seconds = time.time() - start
+        logger.debug(
+            f"Refit {len(seeds)} resamples in {wall_seconds:.1f}s wall time; "
+            f"{seconds.mean():.1f}s (sd {seconds.std():.1f}s) per resample per worker, "
+            f"{wall_seconds / len(seeds):.1f}s per resample with {args.n_jobs} workers"
+        )
+    except Exception:
+        logger.error("Failed to refit resamples", exc_info=True)
+        raise
+
+    # @@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@
+    print("Score stability")
+    try:
+        tract_stability, cluster_stability = summarize_stability(
+            reference, resampled_labels, gm_model.n_components
+        )
+        tracts = pd.DataFrame(
+            {"cluster": reference, "stability": tract_stability}, index=df.index
+        )
+        clusters = pd.DataFrame(
+            {
+                "n_tracts": np.bincount(reference, minlength=gm_model.n_components),
+                "stability": cluster_stability,
+            },
+            index=pd.Index(range(gm_model.n_components), name="cluster"),
+        )
+        logger.debug(f"Mean tract stability: {tract_stability.mean():.3f}")
+    except Exception:
+        logger.error("Failed to score stability", exc_info=True)
+        raise
+
+    # @@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@
+    print("Save outputs")
+    try:
+        tracts.to_pickle(tracts_dst)
+        clusters.to_csv(clusters_dst)
+        logger.debug("Finished saving outputs")
+    except Exception:
+        logger.error("Failed to save outputs", exc_info=True)
+        raise
@@ -0,0 +1,23 @@
+# third-party imports
+import numpy as np
+import pytest
+
+# local imports
+from src.neighbors import SimilarTracts
+
+
+@pytest.fixture
+def index():
+    X = np.arange(10, dtype=float).reshape(5, 2)
+    return SimilarTracts(X, list("abcde"), ["MD", "MD", "VA", "VA", "VA"], [0, 0, 1, 1, 1])
+
+
+def test_query_excludes_itself(index):
+    out = index.query(geoids=["c"], k=2)
+    assert set(out["geoid"]) == {"b", "d"}
+    assert (out["distance"] > 0).all()
+
+
+def test_query_unknown_geoid_raises(index):
+    with pytest.raises(KeyError, match="zzz"):
+        index.query(geoids=["a", "zzz"])